@@ -15,6 +15,7 @@ from datetime import timedelta
 import os
 import pybrake
 from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -79,9 +80,17 @@ TEMPLATES = [
 WSGI_APPLICATION = 'app.wsgi.application'
 
 # REST framework settings
+# Rates of the auth endpoints (helpers.throttling.GCRAThrottle), each
+# applies per IP, per email and per mobile number
 REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
-        'user': '3/min'
+        'login': '3/min',
+        'otp': '3/min',
+        'password_reset': '3/min',
+        'register': '10/min',
+        'bulk_register': '10/hour',
+        'refresh_token': '30/min',
+        'profile_image': '10/min',
     }
 }
 
@@ -112,6 +121,15 @@ CACHES = {
 
 CACHE_TTL = 60 * 15
 
+# In-process LRU in front of redis (see helpers.cache_adapter), only
+# keys starting with one of PREFIXES are cached in process. Entries
+# live at most TIMEOUT seconds if an invalidation is missed.
+CACHE_L1 = {
+    'PREFIXES': (),
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 30,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -130,6 +148,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Argon2 is preferred, hashes made with an older hasher or cost are
+# upgraded on the next successful login
+PASSWORD_HASHERS = [
+    'helpers.hashers.Argon2PasswordHasher',
+    'helpers.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_HASHER_COST = {
+    'argon2': {
+        'time_cost': 2,
+        'memory_cost': 512,
+        'parallelism': 2,
+    },
+    'pbkdf2_sha256': {
+        'iterations': 150000,
+    },
+}
+
+# Size of the process pool that hashes passwords (see
+# helpers.password_helper), 0 to hash on the request thread and
+# None for one per CPU. Every server process has its own pool, so
+# it is kept small not to oversubscribe the CPUs
+PASSWORD_HASHING_WORKERS = 2
+
 # JWT settings
 
 SIMPLE_JWT = {
@@ -158,6 +201,13 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# In-process cache of validated access tokens used by
+# helpers.authentication.CachedJWTAuthentication
+JWT_VERIFICATION_CACHE = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 60,
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -189,9 +239,55 @@ CELERY_BEAT_SCHEDULE = {
     "cron-2": {
         "task": "crons.another_demo_cron.hello2",
         "schedule": crontab()
+    },
+    "profile-image-variants": {
+        "task": "crons.profile_image_variants."
+                "make_missing_profile_image_variants",
+        "schedule": crontab(hour=3, minute=0)
+    },
+    "purge-deleted-rows": {
+        "task": "crons.purge_deleted_rows.purge_deleted_rows",
+        "schedule": crontab(hour=4, minute=0)
     }
 }
 
+# Crons (see helpers.cron_helper), a run holds a lock leased for
+# CRON_LOCK_LEASE seconds and renewed while it runs, and is
+# published with a random delay of up to CRON_JITTER seconds
+CRON_LOCK_LEASE = 60
+CRON_JITTER = 10
+# Batch jobs (see helpers.batch_job) walk their table BATCH_JOB_CHUNK_SIZE
+# rows at a time, the checkpoint of an unfinished run is kept for
+# BATCH_JOB_CHECKPOINT_TIMEOUT seconds
+BATCH_JOB_CHUNK_SIZE = 1000
+BATCH_JOB_CHECKPOINT_TIMEOUT = 7 * 24 * 60 * 60
+# Soft deleted rows of PURGE_MODELS are archived and hard deleted
+# PURGE_RETENTION_DAYS after their deletion, PURGE_CHUNK_SIZE rows
+# per transaction (see helpers.purge)
+PURGE_MODELS = ['core.User']
+PURGE_RETENTION_DAYS = 30
+PURGE_CHUNK_SIZE = 500
+
+# Celery queues, each is consumed by its own worker (see
+# docker-compose.yml). transactional carries the emails a user
+# is waiting for, RabbitMQ delivers its higher priority tasks first
+CELERY_QUEUES = (
+    Queue('transactional', routing_key='transactional',
+          queue_arguments={'x-max-priority': 10}),
+    Queue('bulk', routing_key='bulk'),
+    Queue('cron', routing_key='cron'),
+)
+
+CELERY_ROUTES = {
+    'send_reset_password_email': {
+        'queue': 'transactional', 'routing_key': 'transactional',
+        'priority': 9},
+    'send_welcome_email': {
+        'queue': 'transactional', 'routing_key': 'transactional',
+        'priority': 3},
+    'crons.*': {'queue': 'cron', 'routing_key': 'cron'},
+}
+
 # Celery config
 CELERY = {
     'BROKER_URL': 'BROKER_URL',
@@ -200,9 +296,34 @@ CELERY = {
     'CELERY_TASK_SERIALIZER': 'json',
     'CELERY_RESULT_SERIALIZER': 'json',
     'CELERY_ACCEPT_CONTENT': ['json'],
-    'CELERYBEAT_SCHEDULE': CELERY_BEAT_SCHEDULE
+    'CELERYBEAT_SCHEDULE': CELERY_BEAT_SCHEDULE,
+    'CELERY_QUEUES': CELERY_QUEUES,
+    'CELERY_ROUTES': CELERY_ROUTES,
+    # tasks without a route (bulk emails, image processing)
+    'CELERY_DEFAULT_QUEUE': 'bulk',
+    'CELERY_DEFAULT_ROUTING_KEY': 'bulk',
+    # the worker of each queue sets its own --prefetch-multiplier,
+    # with late acks a prefetched task waits in the broker instead
+    # of behind a long task in a worker
+    'CELERY_ACKS_LATE': True,
+    'CELERYD_PREFETCH_MULTIPLIER': 1,
+    # tasks are fire-and-forget, a task whose result is read sets
+    # ignore_result=False and its result expires after an hour
+    'CELERY_IGNORE_RESULT': True,
+    'CELERY_TASK_RESULT_EXPIRES': 60 * 60,
+    # publishes wait for the broker to confirm the message, the
+    # outbox relay deletes a message only once it is confirmed
+    'BROKER_TRANSPORT_OPTIONS': {'confirm_publish': True},
 }
 
+# Outbox (see helpers.outbox), request handlers write their tasks
+# to the outbox and the relay publishes up to OUTBOX_BATCH_SIZE of
+# them at a time, polling every OUTBOX_POLL_INTERVAL seconds
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_INTERVAL = 0.5
+# attempts to reach the broker before a relay run gives up
+OUTBOX_PUBLISH_MAX_RETRIES = 3
+
 
 # Email config
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -212,6 +333,16 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = 'your_account@gmail.com'
 EMAIL_HOST_PASSWORD = 'password'
 EMAIL_USE_SSL = False
+# Queued emails (see worker.tasks.queue_email) are sent in batches
+# of EMAIL_BATCH_SIZE, EMAIL_BATCH_DELAY seconds after the first
+# email of a batch is queued
+EMAIL_BATCH_SIZE = 100
+EMAIL_BATCH_DELAY = 5
+# Emails compiled when a worker starts (see helpers.email_templates),
+# each has a .txt and a .html template
+EMAIL_TEMPLATES = ['user/emails/welcome', 'user/emails/reset_password']
+# Rendered outputs of the {% fragment %} tag kept per process
+EMAIL_FRAGMENT_CACHE_SIZE = 128
 
 
 # Airbrake config
@@ -248,10 +379,41 @@ notifier = pybrake.Notifier(project_id=AIRBRAKE['project_id'],
 # AWS Creds
 AWS_ACCESS_KEY = 'AWS_ACCESS_KEY'
 AWS_SECRET_KEY = 'AWS_SECRET_KEY'
+AWS_BUCKET = 'AWS_BUCKET'
+# None for AWS, set it to use a local s3 (MinIO, moto server)
+AWS_S3_ENDPOINT_URL = None
+# Connections kept alive by the shared s3 client (see helpers.s3_helper)
+AWS_S3_MAX_POOL_CONNECTIONS = 25
+# Files larger than this are uploaded in parts of this size
+AWS_S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
 AWS_BUCKET_FOLDERS = {
     'profile': 'profile/',
     'general': 'general/'
 }
+# Uploads waiting for the worker to send them to s3, the directory
+# must be shared by the app and the workers
+UPLOAD_SPOOL_DIR = os.path.join(BASE_DIR, 'spool')
+# Files of these folders are stored once under the sha256 of their
+# content and served with AWS_S3_IMMUTABLE_CACHE_CONTROL
+AWS_S3_CONTENT_ADDRESSED_FOLDERS = ['profile']
+AWS_S3_IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Profile images uploaded directly to s3 with a presigned POST
+PROFILE_IMAGE_UPLOAD = {
+    'MAX_SIZE': 5 * 1024 * 1024,
+    'CONTENT_TYPES': ['image/jpeg', 'image/png', 'image/webp'],
+    'EXPIRES_IN': 300,
+}
+# Square thumbnails made by the worker from every profile image
+PROFILE_IMAGE_VARIANTS = {
+    'SIZES': [64, 128, 256],
+    'FORMATS': ['WEBP', 'JPEG'],
+    'QUALITY': 80,
+}
+# Size of the process pool that encodes the variants (see
+# helpers.image_helper), 0 to encode them in the worker process
+# and None for one per CPU. The celery workers already run a
+# process per CPU, so they encode inline by default
+IMAGE_PROCESSING_WORKERS = 0
 
 # Logging
 LOGGING = {
@@ -30,3 +30,8 @@ CACHES = {
 
 # REST FRAMEWORK
 REST_FRAMEWORK = {}
+
+# Celery, tasks run in process when they are published, relayed
+# from the outbox included
+CELERY = dict(CELERY, CELERY_ALWAYS_EAGER=True, BROKER_URL='memory://',
+              CELERY_RESULT_BACKEND='cache+memory://')
@@ -0,0 +1,88 @@
+import asyncore
+import smtpd
+import threading
+import time
+
+from django.core.mail import EmailMessage, send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from helpers.email_helper import close_mail_connection, send_messages
+
+
+class SinkServer(smtpd.SMTPServer):
+    """
+    SMTP server which accepts and drops every message
+    """
+
+    def process_message(self, *args, **kwargs):
+        pass
+
+
+class Command(BaseCommand):
+    """Django Command to compare the email throughput of a new SMTP
+    connection per email with the shared connection of
+    helpers.email_helper, one email at a time and in batches. It
+    starts a local SMTP sink unless --port is given"""
+
+    help = 'Benchmarks sending emails over new and shared SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument(
+            '--port', type=int, help='port of a running SMTP sink')
+
+    def start_sink(self, host):
+        """
+        Starts the sink in a daemon thread and returns its port
+        """
+        server = SinkServer((host, 0), None, decode_data=True)
+        threading.Thread(
+            target=asyncore.loop, kwargs={'timeout': 0.001}, daemon=True
+        ).start()
+
+        return server.socket.getsockname()[1]
+
+    def get_messages(self, count):
+        return [
+            EmailMessage('Welcome!', 'Welcome to our side', 'from@test.com',
+                         ['user' + str(index) + '@test.com'])
+            for index in range(count)
+        ]
+
+    def connection_per_email(self, messages, batch_size):
+        for message in messages:
+            send_mail(message.subject, message.body, message.from_email,
+                      message.to, fail_silently=False)
+
+    def shared_connection(self, messages, batch_size):
+        for message in messages:
+            send_messages([message])
+
+    def shared_connection_batches(self, messages, batch_size):
+        for start in range(0, len(messages), batch_size):
+            send_messages(messages[start:start + batch_size])
+
+    def handle(self, *args, **options):
+        port = options['port'] or self.start_sink(options['host'])
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=options['host'], EMAIL_PORT=port,
+            EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='')
+
+        with smtp_settings:
+            for name, send in (
+                    ('connection per email', self.connection_per_email),
+                    ('shared connection', self.shared_connection),
+                    ('shared connection, batches',
+                     self.shared_connection_batches)):
+                messages = self.get_messages(options['emails'])
+                start = time.perf_counter()
+                send(messages, options['batch_size'])
+                elapsed = time.perf_counter() - start
+                close_mail_connection()
+                self.stdout.write('{}: {:.0f} emails/s'.format(
+                    name, len(messages) / elapsed))
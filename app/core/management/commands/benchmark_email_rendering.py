@@ -0,0 +1,54 @@
+import time
+
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand
+
+from helpers.email_templates import create_engine, render_email
+
+
+class Command(BaseCommand):
+    """Django Command to measure how many welcome emails are rendered
+    per second with the old string concatenation, with templates
+    loaded on every render, with the cached loader and with the
+    cached loader and the fragment LRU"""
+
+    help = 'Benchmarks the rendering of the email templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=2000)
+
+    def concatenate(self, index):
+        return EmailMessage(
+            "Welcome!", "Welcome to our side user " + str(index),
+            'from@test.com', ['user' + str(index) + '@test.com'])
+
+    def get_renderer(self, engine):
+        def render(index):
+            return render_email(
+                'user/emails/welcome', "Welcome!",
+                {'name': 'user ' + str(index)}, 'from@test.com',
+                ['user' + str(index) + '@test.com'], engine=engine)
+
+        return render
+
+    def handle(self, *args, **options):
+        cached_loader = create_engine()
+        cached_loader.fragments = None
+        renderers = (
+            ('string concatenation', self.concatenate),
+            ('templates, no caching',
+             self.get_renderer(create_engine(cached=False))),
+            ('cached loader', self.get_renderer(cached_loader)),
+            ('cached loader and fragment LRU',
+             self.get_renderer(create_engine())),
+        )
+
+        for name, render in renderers:
+            # the first render compiles the templates
+            render(0)
+            start = time.perf_counter()
+            for index in range(options['emails']):
+                render(index).message()
+            elapsed = time.perf_counter() - start
+            self.stdout.write('{}: {:.0f} emails/s'.format(
+                name, options['emails'] / elapsed))
@@ -0,0 +1,106 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+BENCHMARK_EMAIL_DOMAIN = '@benchmark.invalid'
+
+SEED_SQL = """
+    INSERT INTO core_user (
+        password, is_superuser, created_at, updated_at, is_deleted, uuid,
+        email, name, mobile_number, is_active, is_staff
+    )
+    SELECT '!', false, now(), now(), i %% 10 = 0,
+           md5('benchmark' || i::text)::uuid,
+           'user' || i::text || %s, 'Benchmark User',
+           'b' || lpad(i::text, 10, '0'), true, false
+    FROM generate_series(%s, %s) AS i
+"""
+
+
+class Command(BaseCommand):
+    """Django Command to measure the latency of the login lookups
+    on core_user at different table sizes. Benchmark rows are
+    inserted with generate_series and removed at the end"""
+
+    help = 'Benchmarks the email/mobile_number login lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, nargs='+', default=[1000000, 10000000],
+            help='table sizes to benchmark at')
+        parser.add_argument(
+            '--lookups', type=int, default=1000,
+            help='number of lookups per field and table size')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='do not delete the benchmark rows at the end')
+
+    def seed(self, start, end):
+        """
+        Inserts benchmark users with ids start..end, every
+        tenth user is soft deleted
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [BENCHMARK_EMAIL_DOMAIN, start, end])
+            cursor.execute('ANALYZE core_user')
+
+    def measure(self, size, lookups, field):
+        """
+        Runs the login lookup for random live users and
+        returns the p50 and p99 latency in milliseconds
+        """
+        user_model = get_user_model()
+        step = max(1, size // lookups)
+        timings = []
+        for i in range(1, size + 1, step):
+            if i % 10 == 0:
+                i += 1
+            if field == 'email':
+                value = 'user' + str(i) + BENCHMARK_EMAIL_DOMAIN
+            else:
+                value = 'b' + str(i).zfill(10)
+
+            start = time.perf_counter()
+            user_model.objects.get(**{field: value, 'is_deleted': False})
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+
+        return (timings[len(timings) // 2],
+                timings[min(len(timings) - 1, int(len(timings) * 0.99))])
+
+    def explain(self, field):
+        """
+        Returns the query plan of the login lookup
+        """
+        queryset = get_user_model().objects.filter(
+            **{field: 'user1' + BENCHMARK_EMAIL_DOMAIN, 'is_deleted': False})
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def handle(self, *args, **options):
+        seeded = 0
+        try:
+            for size in sorted(options['users']):
+                self.stdout.write('Seeding ' + str(size) + ' users...')
+                self.seed(seeded + 1, size)
+                seeded = size
+                for field in ('email', 'mobile_number'):
+                    p50, p99 = self.measure(size, options['lookups'], field)
+                    self.stdout.write(
+                        '{} users, {} lookup: p50 {:.3f} ms, '
+                        'p99 {:.3f} ms'.format(size, field, p50, p99))
+                self.stdout.write(self.explain('email'))
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'DELETE FROM core_user WHERE email LIKE %s',
+                        ['%' + BENCHMARK_EMAIL_DOMAIN])
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished!'))
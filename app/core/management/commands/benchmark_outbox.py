@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import OutboxMessage
+from helpers.outbox import enqueue, relay_messages
+from worker.worker import app
+
+
+class Command(BaseCommand):
+    """Django Command to compare the latency a request handler spends
+    on publishing a task inline with writing it to the outbox, for
+    each broker latency given. The broker latency is added to every
+    publish to the in-memory broker, the outbox is relayed meanwhile
+    in a thread as the relay process would"""
+
+    help = 'Benchmarks publishing tasks inline and through the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=200)
+        parser.add_argument(
+            '--broker-latency', type=float, nargs='+',
+            default=[0, 10, 50, 200],
+            help='milliseconds added to every publish')
+
+    def relay(self, stop):
+        try:
+            while not stop.is_set():
+                if not relay_messages():
+                    time.sleep(0.05)
+        finally:
+            connection.close()
+
+    def measure(self, publish, tasks):
+        """
+        Returns the p50 and p99 latency of publish in milliseconds
+        """
+        timings = []
+        for _ in range(tasks):
+            start = time.perf_counter()
+            publish()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+    def handle(self, *args, **options):
+        app.conf.update(BROKER_URL='memory://', CELERY_ALWAYS_EAGER=False)
+
+        @app.task(name='benchmark_outbox_task')
+        def benchmark_task():
+            pass
+
+        send_task_message = app.amqp.send_task_message
+        broker_latency = [0]
+
+        def slow_send_task_message(*args, **kwargs):
+            time.sleep(broker_latency[0] / 1000)
+            return send_task_message(*args, **kwargs)
+
+        app.amqp.send_task_message = slow_send_task_message
+
+        def inline():
+            benchmark_task.apply_async()
+
+        def outbox():
+            with transaction.atomic():
+                enqueue(benchmark_task)
+
+        for latency in options['broker_latency']:
+            broker_latency[0] = latency
+            stop = threading.Event()
+            relay = threading.Thread(target=self.relay, args=(stop,))
+            relay.start()
+            try:
+                for name, publish in (('inline', inline),
+                                      ('outbox', outbox)):
+                    p50, p99 = self.measure(publish, options['tasks'])
+                    self.stdout.write(
+                        'broker latency {:.0f} ms, {}: p50 {:.2f} ms, '
+                        'p99 {:.2f} ms'.format(latency, name, p50, p99))
+            finally:
+                stop.set()
+                relay.join()
+
+        OutboxMessage.objects.filter(
+            task_name='benchmark_outbox_task').delete()
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from helpers.password_helper import get_hashing_pool
+
+
+def hash_with(algorithm):
+    for hasher in get_hashers():
+        if hasher.algorithm == algorithm:
+            return hasher.encode('Benchmark$123', hasher.salt())
+
+
+class Command(BaseCommand):
+    """Django Command to measure the hashes/sec of every hasher in
+    settings.PASSWORD_HASHERS with their configured cost, on one
+    core and across the hashing pool"""
+
+    help = 'Benchmarks the configured password hashers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hashes', type=int, default=50,
+            help='number of hashes per hasher and run')
+
+    def handle(self, *args, **options):
+        count = options['hashes']
+        cores = os.cpu_count() or 1
+        pool = get_hashing_pool()
+        for hasher in get_hashers():
+            hash_with(hasher.algorithm)
+
+            start = time.perf_counter()
+            for _ in range(count):
+                hash_with(hasher.algorithm)
+            single = count / (time.perf_counter() - start)
+
+            line = '{}: {:.1f} hashes/sec on one core'.format(
+                hasher.algorithm, single)
+            if pool is not None:
+                algorithms = [hasher.algorithm] * count * cores
+                list(pool.map(hash_with, algorithms[:cores]))
+                start = time.perf_counter()
+                list(pool.map(hash_with, algorithms))
+                pooled = len(algorithms) / (time.perf_counter() - start)
+                line += ', {:.1f} hashes/sec in the pool ({:.1f}/core)'.format(
+                    pooled, pooled / cores)
+            self.stdout.write(line)
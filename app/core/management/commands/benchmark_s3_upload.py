@@ -0,0 +1,60 @@
+import io
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from helpers.s3_helper import create_s3_client, get_s3_client
+
+
+class Command(BaseCommand):
+    """Django Command to compare the upload latency of a new s3 client
+    per upload with the shared client of helpers.s3_helper. Run it
+    against a local s3 (MinIO, moto server) by setting
+    AWS_S3_ENDPOINT_URL"""
+
+    help = 'Benchmarks s3 uploads with a client per upload and shared'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=100)
+        parser.add_argument(
+            '--size', type=int, default=100 * 1024, help='bytes per upload')
+
+    def measure(self, get_client, bucket, data, uploads):
+        """
+        Uploads data the given number of times and returns the
+        p50 and p95 latency in milliseconds
+        """
+        timings = []
+        for index in range(uploads):
+            start = time.perf_counter()
+            get_client().upload_fileobj(
+                io.BytesIO(data), bucket, 'benchmark/' + str(index))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+    def handle(self, *args, **options):
+        bucket = getattr(settings, 'AWS_BUCKET')
+        data = b'0' * options['size']
+        client = get_s3_client()
+        if getattr(settings, 'AWS_S3_ENDPOINT_URL', None):
+            existing = [item['Name'] for item in client.list_buckets()[
+                'Buckets']]
+            if bucket not in existing:
+                client.create_bucket(Bucket=bucket)
+
+        try:
+            for name, get_client in (('client per upload', create_s3_client),
+                                     ('shared client', get_s3_client)):
+                p50, p95 = self.measure(
+                    get_client, bucket, data, options['uploads'])
+                self.stdout.write('{}: p50 {:.1f} ms, p95 {:.1f} ms'.format(
+                    name, p50, p95))
+        finally:
+            client.delete_objects(Bucket=bucket, Delete={'Objects': [
+                {'Key': 'benchmark/' + str(index)}
+                for index in range(options['uploads'])
+            ]})
@@ -0,0 +1,65 @@
+import threading
+import time
+
+# registers the ping task start_worker expects
+from celery.contrib.testing import tasks  # noqa
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand
+
+from worker.worker import app
+
+
+class Command(BaseCommand):
+    """Django Command to compare the throughput and the result
+    backend writes of a task which stores its result with one
+    which ignores it. The tasks run on an in-process worker, the
+    broker and the result backend are taken from the arguments"""
+
+    help = 'Benchmarks tasks storing and ignoring their results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=2000)
+        parser.add_argument('--broker', default='memory://')
+        parser.add_argument(
+            '--backend', default='redis://redis:6379/1',
+            help='result backend the stored results are written to')
+
+    def handle(self, *args, **options):
+        app.conf.update(
+            BROKER_URL=options['broker'],
+            CELERY_RESULT_BACKEND=options['backend'],
+            CELERY_ALWAYS_EAGER=False)
+        done = threading.Semaphore(0)
+        writes = []
+
+        store_result = app.backend.store_result
+
+        def counting_store_result(*args, **kwargs):
+            writes.append(1)
+            return store_result(*args, **kwargs)
+
+        app.backend.store_result = counting_store_result
+
+        @app.task(name='benchmark_stored_result', ignore_result=False)
+        def stored_result():
+            done.release()
+            return True
+
+        @app.task(name='benchmark_ignored_result', ignore_result=True)
+        def ignored_result():
+            done.release()
+            return True
+
+        with start_worker(app, perform_ping_check=False, loglevel='ERROR'):
+            for name, task in (('result stored', stored_result),
+                               ('result ignored', ignored_result)):
+                del writes[:]
+                start = time.perf_counter()
+                for _ in range(options['tasks']):
+                    task.apply_async(queue='bulk')
+                for _ in range(options['tasks']):
+                    done.acquire()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    '{}: {:.0f} tasks/s, {} backend writes'.format(
+                        name, options['tasks'] / elapsed, len(writes)))
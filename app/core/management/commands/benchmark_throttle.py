@@ -0,0 +1,69 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from helpers.throttling import GCRAThrottle
+
+
+class BenchmarkView:
+    throttle_scope = 'benchmark'
+
+
+class Command(BaseCommand):
+    """Django Command to compare the per-request cost of DRF's
+    timestamp history throttle with the GCRA throttle as the
+    number of requests allowed per window grows"""
+
+    help = 'Benchmarks the throttle classes at different request rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rates', type=int, nargs='+', default=[10, 100, 1000, 10000],
+            help='requests per minute to benchmark, each is sent in full')
+
+    def get_request(self):
+        request = APIRequestFactory().post(
+            '/', {'email': 'benchmark@benchmark.invalid'}, format='json',
+            REMOTE_ADDR='10.255.255.1')
+
+        return Request(request, parsers=[JSONParser()])
+
+    def measure(self, throttle_class, rate):
+        """
+        Sends rate requests through the throttle and returns
+        the average cost per request in microseconds
+        """
+        request = self.get_request()
+        view = BenchmarkView()
+        start = time.perf_counter()
+        for _ in range(rate):
+            throttle = throttle_class()
+            throttle.allow_request(request, view)
+
+        return (time.perf_counter() - start) * 1000000 / rate
+
+    def handle(self, *args, **options):
+        # the first pass warms up connections and is not reported
+        rates = [10] + options['rates']
+        for index, rate in enumerate(rates):
+            history_throttle = type('HistoryThrottle', (AnonRateThrottle,), {
+                'rate': str(rate) + '/min'})
+            gcra_throttle = type('BenchmarkGCRAThrottle', (GCRAThrottle,), {
+                'rate': str(rate) + '/min', 'scope': 'benchmark'})
+            try:
+                history_cost = self.measure(history_throttle, rate)
+                gcra_cost = self.measure(gcra_throttle, rate)
+            finally:
+                cache.delete_pattern('throttle_anon_*')
+                cache.delete_pattern('throttle:gcra:benchmark:*')
+
+            if index > 0:
+                self.stdout.write(
+                    '{}/min: history throttle {:.1f} us/request, '
+                    'GCRA throttle {:.1f} us/request'.format(
+                        rate, history_cost, gcra_cost))
@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django Command to load test an API endpoint, run it against
+    the WSGI and the ASGI deployment to compare requests/sec
+    and latency"""
+
+    help = 'Sends concurrent requests to a URL and reports rps and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='absolute URL to load test')
+        parser.add_argument('--method', default='POST')
+        parser.add_argument(
+            '--data', default='{}', help='JSON body of every request')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        local = threading.local()
+        body = json.loads(options['data'])
+
+        def send(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            start = time.perf_counter()
+            try:
+                status_code = local.session.request(
+                    options['method'], options['url'], json=body).status_code
+            except requests.RequestException:
+                status_code = 'error'
+
+            return status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(send, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for _, latency in results)
+        statuses = Counter(str(status_code) for status_code, _ in results)
+
+        def percentile(value):
+            index = min(len(latencies) - 1, int(len(latencies) * value))
+            return latencies[index] * 1000
+
+        self.stdout.write('requests/sec: {:.1f}'.format(
+            len(results) / elapsed))
+        self.stdout.write('p50: {:.1f} ms, p99: {:.1f} ms'.format(
+            percentile(0.5), percentile(0.99)))
+        self.stdout.write('status codes: ' + ', '.join(
+            code + ' x ' + str(count) for code, count in statuses.items()))
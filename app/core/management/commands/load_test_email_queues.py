@@ -0,0 +1,93 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from worker.tasks import send_reset_password_email, send_welcome_email
+from worker.worker import app
+
+
+class Command(BaseCommand):
+    """Django Command to flood the workers with welcome emails and
+    measure the latency of the reset password emails sent meanwhile.
+    The results are not stored, an email is done when its worker
+    sends the task-succeeded event (events are enabled on the workers
+    while it runs). Run it against the docker-compose workers, with
+    EMAIL_BACKEND set to the console or a local SMTP sink"""
+
+    help = 'Measures reset email latency during a flood of welcome emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--welcome-emails', type=int, default=5000)
+        parser.add_argument('--reset-emails', type=int, default=20)
+        parser.add_argument(
+            '--interval', type=float, default=0.5,
+            help='seconds between two reset emails')
+        parser.add_argument(
+            '--reset-priority', type=int,
+            help='overrides the priority of the reset emails route')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def flood(self, count):
+        for index in range(count):
+            send_welcome_email.delay(
+                'load-test-' + str(index) + '@test.invalid', 'Load Test')
+
+    def watch(self, started, latencies, listening):
+        def on_succeeded(event):
+            start = started.get(event['uuid'])
+            if start is not None:
+                latencies[event['uuid']] = (time.perf_counter() - start) * 1000
+
+        with app.connection() as connection:
+            receiver = app.events.Receiver(
+                connection, handlers={'task-succeeded': on_succeeded})
+            listening.set()
+            receiver.capture(limit=None, timeout=None, wakeup=True)
+
+    def handle(self, *args, **options):
+        started = {}
+        latencies = {}
+        listening = threading.Event()
+        threading.Thread(
+            target=self.watch, args=(started, latencies, listening),
+            daemon=True).start()
+        listening.wait()
+        app.control.enable_events()
+
+        flood = threading.Thread(
+            target=self.flood, args=(options['welcome_emails'],),
+            daemon=True)
+        flood.start()
+
+        reset_options = {}
+        if options['reset_priority'] is not None:
+            reset_options['priority'] = options['reset_priority']
+
+        for _ in range(options['reset_emails']):
+            time.sleep(options['interval'])
+            start = time.perf_counter()
+            result = send_reset_password_email.apply_async(
+                ('load-test-reset@test.invalid', 'http://localhost/reset/'),
+                **reset_options)
+            started[result.id] = start
+
+        deadline = time.perf_counter() + options['timeout']
+        while len(latencies) < len(started) and \
+                time.perf_counter() < deadline:
+            time.sleep(0.1)
+
+        flood.join()
+        app.control.disable_events()
+        timeouts = len(started) - len(latencies)
+        if not latencies:
+            self.stdout.write('every reset email timed out')
+            return
+
+        latencies = sorted(latencies.values())
+        self.stdout.write(
+            'reset email latency: p50 {:.0f} ms, p95 {:.0f} ms, '
+            'max {:.0f} ms, {} timed out'.format(
+                latencies[len(latencies) // 2],
+                latencies[int(len(latencies) * 0.95)],
+                latencies[-1], timeouts))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from helpers.purge import PurgeJob
+
+
+class Command(BaseCommand):
+    """Django Command to archive and hard delete the rows soft deleted
+    more than the retention ago, of the models of PURGE_MODELS or
+    the given ones, chunk by chunk in short transactions"""
+
+    help = 'Archives and deletes soft deleted rows past the retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models',
+            help='app_label.ModelName, defaults to PURGE_MODELS')
+        parser.add_argument('--retention-days', type=int)
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument(
+            '--output',
+            help='gzipped JSONL file the rows are appended to, instead '
+                 'of the archive table')
+
+    def handle(self, *args, **options):
+        retention = None
+        if options['retention_days'] is not None:
+            retention = timedelta(days=options['retention_days'])
+
+        for label in options['models'] or getattr(
+                settings, 'PURGE_MODELS', []):
+            job = PurgeJob(apps.get_model(label), retention,
+                           options['chunk_size'], options['output'])
+            start = time.perf_counter()
+            job.run()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                '{}: purged {} rows in {:.1f} s, {:.0f} rows/s'.format(
+                    label, job.purged, elapsed, job.purged / elapsed)))
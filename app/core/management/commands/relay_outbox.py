@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, connection
+
+from helpers.outbox import relay_messages
+from worker.worker import app
+
+
+class Command(BaseCommand):
+    """Django Command to publish the tasks written to the outbox by
+    the request handlers. Full batches are followed by the next one
+    right away, otherwise the outbox is polled every
+    OUTBOX_POLL_INTERVAL seconds"""
+
+    help = 'Relays the outbox messages to the broker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='relays a single batch and exits')
+
+    def handle(self, *args, **options):
+        # registers the tasks of CELERY_IMPORTS by name
+        app.loader.import_default_modules()
+        batch_size = options['batch_size'] or getattr(
+            settings, 'OUTBOX_BATCH_SIZE', 100)
+        interval = getattr(settings, 'OUTBOX_POLL_INTERVAL', 0.5)
+
+        while True:
+            try:
+                published = relay_messages(batch_size)
+            except (InterfaceError, OperationalError):
+                self.stdout.write('Database unavailable, Waiting 1 second...')
+                # drops the broken connection, the next run reconnects
+                connection.close()
+                time.sleep(1)
+                continue
+
+            if published:
+                self.stdout.write('relayed {} messages'.format(published))
+            if options['once']:
+                break
+            if published < batch_size:
+                time.sleep(interval)
@@ -0,0 +1,76 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Builds the partial indexes for the is_deleted=False lookups with
+    CREATE INDEX CONCURRENTLY so that core_user is not locked for
+    writes while they are built, which is why the migration
+    can't run inside a transaction.
+
+    Live users sharing an email or mobile number must be cleaned up
+    before it runs, or the unique indexes fail to build. A failed
+    build leaves an invalid index behind, so each index is dropped
+    before it is built and migrate can simply be run again
+    """
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_auto_20200518_0946'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'DROP INDEX CONCURRENTLY IF EXISTS '
+                '"core_user_email_live_uniq"',
+                'CREATE UNIQUE INDEX CONCURRENTLY '
+                '"core_user_email_live_uniq" ON "core_user" ("email") '
+                'WHERE "is_deleted" = false',
+            ],
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                        '"core_user_email_live_uniq"',
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(is_deleted=False),
+                        fields=('email',),
+                        name='core_user_email_live_uniq'),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                'DROP INDEX CONCURRENTLY IF EXISTS '
+                '"core_user_mobile_number_live_uniq"',
+                'CREATE UNIQUE INDEX CONCURRENTLY '
+                '"core_user_mobile_number_live_uniq" ON "core_user" '
+                '("mobile_number") WHERE "is_deleted" = false',
+            ],
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                        '"core_user_mobile_number_live_uniq"',
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(is_deleted=False),
+                        fields=('mobile_number',),
+                        name='core_user_mobile_number_live_uniq'),
+                ),
+            ],
+        ),
+        # matches the UPPER("email"::text) Django emits for email__iexact
+        migrations.RunSQL(
+            sql=[
+                'DROP INDEX CONCURRENTLY IF EXISTS '
+                '"core_user_email_ci_live_idx"',
+                'CREATE INDEX CONCURRENTLY '
+                '"core_user_email_ci_live_idx" ON "core_user" '
+                '(UPPER("email"::text)) WHERE "is_deleted" = false',
+            ],
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                        '"core_user_email_ci_live_idx"',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.13 on 2026-10-18 20:31
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_profile_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_variants',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
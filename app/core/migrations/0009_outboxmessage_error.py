@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_archivedrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='error',
+            field=models.TextField(null=True),
+        ),
+    ]
@@ -1 +1,3 @@
 from .user import User
+from .outbox import OutboxMessage
+from .archive import ArchivedRow
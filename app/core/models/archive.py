@@ -0,0 +1,22 @@
+from django.contrib.postgres.fields import JSONField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class ArchivedRow(models.Model):
+    """
+    A soft deleted row moved out of its table by the purge
+    (python manage.py purge_deleted_rows), data has the
+    values of its columns
+    """
+    model = models.CharField(max_length=100)
+    row_id = models.BigIntegerField()
+    data = JSONField(encoder=DjangoJSONEncoder)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'row_id'])]
+
+    def __str__(self):
+        return self.model + ' ' + str(self.row_id)
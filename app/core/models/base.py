@@ -1,10 +1,48 @@
+from copy import deepcopy
+
 from django.db import models
-from datetime import datetime
+from django.utils import timezone
 
 import uuid
 
 
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def soft_delete(self):
+        """
+        Soft deletes every row of the queryset with a single
+        UPDATE of the deletion columns, returns the number of rows
+        """
+        now = timezone.now()
+
+        return self.update(is_deleted=True, deleted_at=now, updated_at=now)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    Manager which returns only the rows which are not soft deleted
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+    def all_with_deleted(self):
+        """
+        Returns every row, soft deleted ones included
+        """
+        return super().get_queryset()
+
+
 class BaseModel(models.Model):
+    """
+    Keeps the values of the fields as loaded or last saved, save()
+    on a row which is already in the DB then updates only the
+    fields that changed (and the auto_now ones), and does nothing
+    when no field changed. Set track_dirty_fields = False on a
+    model, or call save(all_fields=True), to update every column
+    """
+    track_dirty_fields = True
+
     class Meta:
         abstract = True
 
@@ -14,7 +52,77 @@ class BaseModel(models.Model):
     is_deleted = models.BooleanField(default=False)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
+    objects = SoftDeleteManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._set_loaded_values(field.attname for field in
+                                    cls._meta.concrete_fields
+                                    if field.attname in instance.__dict__)
+
+        return instance
+
+    def _set_loaded_values(self, attnames):
+        loaded_values = self.__dict__.setdefault('_loaded_values', {})
+        for attname in attnames:
+            value = self.__dict__[attname]
+            # JSON values may be changed in place
+            if isinstance(value, (dict, list)):
+                value = deepcopy(value)
+            loaded_values[attname] = value
+
+    def get_dirty_fields(self):
+        """
+        Returns the names of the fields whose value differs from
+        the loaded or last saved one
+        """
+        loaded_values = self.__dict__.get('_loaded_values', {})
+        dirty_fields = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded_values or \
+                    loaded_values[field.attname] != getattr(
+                        self, field.attname):
+                dirty_fields.append(field.name)
+
+        return dirty_fields
+
+    def save(self, *args, all_fields=False, **kwargs):
+        if self.track_dirty_fields and not all_fields and \
+                not self._state.adding and not args and \
+                kwargs.get('update_fields') is None and \
+                not kwargs.get('force_insert') and \
+                '_loaded_values' in self.__dict__:
+            dirty_fields = self.get_dirty_fields()
+            if not dirty_fields:
+                return
+            kwargs['update_fields'] = dirty_fields + [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and
+                field.name not in dirty_fields]
+
+        super().save(*args, **kwargs)
+
+        if kwargs.get('update_fields') is None:
+            self._set_loaded_values(field.attname for field in
+                                    self._meta.concrete_fields
+                                    if field.attname in self.__dict__)
+        else:
+            self._set_loaded_values(
+                self._meta.get_field(name).attname
+                for name in kwargs['update_fields'])
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self._set_loaded_values(field.attname for field in
+                                self._meta.concrete_fields
+                                if field.attname in self.__dict__ and
+                                (fields is None or field.name in fields or
+                                 field.attname in fields))
+
     def soft_delete(self):
-        self.deleted_at = datetime.utcnow()
+        self.deleted_at = timezone.now()
         self.is_deleted = True
-        self.save()
+        self.save(update_fields=['deleted_at', 'is_deleted', 'updated_at'])
@@ -0,0 +1,21 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    """
+    A task to publish to the broker, written in the same
+    transaction as the change it belongs to and published
+    by the outbox relay (python manage.py relay_outbox)
+    """
+    task_name = models.CharField(max_length=255)
+    args = JSONField(default=list)
+    kwargs = JSONField(default=dict)
+    options = JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # set on a message which can not be published (unknown task,
+    # invalid options), the relay skips it from then on
+    error = models.TextField(null=True)
+
+    def __str__(self):
+        return self.task_name + ' ' + str(self.id)
@@ -1,11 +1,14 @@
+from django.contrib.postgres.fields import JSONField
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
-from .base import BaseModel
+from helpers import password_helper
+from .base import BaseModel, SoftDeleteManager
 
 
-class UserManager(BaseUserManager):
+class UserManager(SoftDeleteManager, BaseUserManager):
 
     def create_user(self, email, password, **extra_attributes):
         """
@@ -23,30 +26,74 @@ class UserManager(BaseUserManager):
 
     def create_superuser(self, email, password):
         """
-        Creates a super user
+        Creates a super user with a single INSERT
         """
-        user = self.create_user(email, password)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
-
-        return user
+        return self.create_user(
+            email, password, is_staff=True, is_superuser=True)
 
 
 class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     """
     Custom user model that supports using email instead of username
     """
+    PROFILE_IMAGE_PENDING = 'pending'
+    PROFILE_IMAGE_UPLOADED = 'uploaded'
+    PROFILE_IMAGE_FAILED = 'failed'
+    PROFILE_IMAGE_STATUSES = (
+        (PROFILE_IMAGE_PENDING, 'Pending'),
+        (PROFILE_IMAGE_UPLOADED, 'Uploaded'),
+        (PROFILE_IMAGE_FAILED, 'Failed'),
+    )
+
     email = models.EmailField(max_length=255, null=False)
     name = models.CharField(max_length=255)
     mobile_number = models.CharField(max_length=15, null=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     profile_image = models.CharField(max_length=1000, null=True)
+    # set while the profile image is uploaded by the worker
+    profile_image_status = models.CharField(
+        max_length=10, null=True, choices=PROFILE_IMAGE_STATUSES)
+    # s3 paths of the thumbnails, keyed on "<size>.<format>"
+    profile_image_variants = JSONField(null=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'id'
 
+    class Meta:
+        # email/mobile_number are unique only among live users, the
+        # partial indexes also serve the is_deleted=False lookups.
+        # core_user_email_ci_live_idx (for email__iexact) is created
+        # with raw SQL in migration 0004.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['email'], condition=Q(is_deleted=False),
+                name='core_user_email_live_uniq'),
+            models.UniqueConstraint(
+                fields=['mobile_number'], condition=Q(is_deleted=False),
+                name='core_user_mobile_number_live_uniq'),
+        ]
+
+    def set_password(self, raw_password):
+        """
+        Hashes the password in the hashing pool
+        """
+        self.password = password_helper.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Checks the password in the hashing pool, the hash is
+        upgraded to the preferred hasher/cost when it is correct
+        """
+        is_correct, new_encoded = password_helper.check_password(
+            raw_password, self.password)
+        if new_encoded is not None:
+            self.password = new_encoded
+            self.save(update_fields=['password'])
+
+        return is_correct
+
     def __str__(self):
         return self.mobile_number + self.password
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+def create_user(index, **params):
+    return get_user_model().objects.create_user(
+        email='user' + str(index) + '@test.com', password='TestPassword$87',
+        name='Test User', mobile_number=str(1234567000 + index), **params)
+
+
+class SoftDeleteTest(TestCase):
+    """
+    Tests the soft delete manager and queryset of BaseModel
+    """
+
+    def setUp(self):
+        self.users = [create_user(index) for index in range(5)]
+
+    def test_manager_excludes_deleted_rows(self):
+        """
+        Test if soft deleted rows are only returned by all_with_deleted
+        """
+        self.users[0].soft_delete()
+
+        User = get_user_model()
+        self.assertEqual(User.objects.count(), 4)
+        self.assertFalse(
+            User.objects.filter(email=self.users[0].email).exists())
+        self.assertEqual(User.objects.all_with_deleted().count(), 5)
+
+    def test_soft_delete_saves_deletion_columns(self):
+        """
+        Test if soft_delete does not write back the other columns
+        """
+        user = self.users[0]
+        get_user_model().objects.filter(id=user.id).update(name='Renamed')
+        user.soft_delete()
+
+        user = get_user_model().objects.all_with_deleted().get(id=user.id)
+        self.assertTrue(user.is_deleted)
+        self.assertIsNotNone(user.deleted_at)
+        self.assertEqual(user.name, 'Renamed')
+
+    def test_queryset_soft_delete_single_query(self):
+        """
+        Test if a queryset of N users is soft deleted in one query
+        """
+        ids = [user.id for user in self.users[:4]]
+        with self.assertNumQueries(1):
+            deleted = get_user_model().objects.filter(
+                id__in=ids).soft_delete()
+
+        self.assertEqual(deleted, 4)
+        self.assertEqual(
+            list(get_user_model().objects.values_list('id', flat=True)),
+            [self.users[4].id])
+        self.assertEqual(get_user_model().objects.all_with_deleted().filter(
+            is_deleted=True, deleted_at__isnull=False).count(), 4)
+
+
+class DirtyFieldsSaveTest(TestCase):
+    """
+    Tests that saves update only the changed fields
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(id=create_user(0).id)
+
+    def get_update_sql(self, **save_params):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save(**save_params)
+
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_save_updates_changed_fields(self):
+        """
+        Test if only the changed and auto_now fields are updated
+        """
+        self.user.name = 'Renamed'
+        sql = self.get_update_sql()
+
+        self.assertEqual(len(sql), 1)
+        self.assertIn('"name"', sql[0])
+        self.assertIn('"updated_at"', sql[0])
+        self.assertNotIn('"profile_image"', sql[0])
+        self.assertNotIn('"password"', sql[0])
+        self.assertEqual(get_user_model().objects.get(
+            id=self.user.id).name, 'Renamed')
+
+    def test_save_without_changes(self):
+        """
+        Test if nothing is written when no field changed, also
+        after a save
+        """
+        self.assertEqual(self.get_update_sql(), [])
+        self.user.name = 'Renamed'
+        self.get_update_sql()
+        self.assertEqual(self.get_update_sql(), [])
+
+    def test_save_detects_changes_in_place(self):
+        """
+        Test if changes inside a JSON value are saved
+        """
+        self.user.profile_image_variants = {'64.webp': 'a'}
+        self.get_update_sql()
+        self.user.profile_image_variants['64.webp'] = 'b'
+        sql = self.get_update_sql()
+
+        self.assertEqual(len(sql), 1)
+        self.assertIn('"profile_image_variants"', sql[0])
+
+    def test_save_all_fields(self):
+        """
+        Test if every column is updated when opting out
+        """
+        sql = self.get_update_sql(all_fields=True)
+
+        self.assertEqual(len(sql), 1)
+        self.assertIn('"profile_image"', sql[0])
+
+    def test_create_superuser_single_insert(self):
+        """
+        Test if the super user is created with a single query
+        """
+        with self.assertNumQueries(1):
+            user = get_user_model().objects.create_superuser(
+                'admin@test.com', 'TestPassword$87')
+
+        user.refresh_from_db()
+        self.assertTrue(user.is_staff)
+        self.assertTrue(user.is_superuser)
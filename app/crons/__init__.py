@@ -1,2 +1,4 @@
 import crons.demo_cron
 import crons.another_demo_cron
+import crons.profile_image_variants
+import crons.purge_deleted_rows
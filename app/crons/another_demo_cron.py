@@ -1,11 +1,11 @@
 from celery.utils.log import get_task_logger
 
-from worker.worker import app as celery_app
+from helpers.cron_helper import cron
 
 logger = get_task_logger(__name__)
 
 
-@celery_app.task
+@cron()
 def hello2():
     logger.info("Cron 2")
 
@@ -0,0 +1,40 @@
+from celery.utils.log import get_task_logger
+from django.contrib.auth import get_user_model
+
+from helpers.batch_job import BatchJob
+from helpers.cron_helper import cron
+from helpers.s3_helper import is_content_addressed
+from worker.tasks import create_profile_image_variants
+
+logger = get_task_logger(__name__)
+
+
+class ProfileImageVariantsJob(BatchJob):
+    """
+    Makes the missing thumbnails of the uploaded profile images,
+    of users registered before the thumbnails or whose thumbnails
+    failed
+    """
+    name = 'profile_image_variants'
+    fields = ('id', 'profile_image')
+
+    def get_queryset(self):
+        User = get_user_model()
+        return User.objects.filter(
+            profile_image_status=User.PROFILE_IMAGE_UPLOADED,
+            profile_image_variants__isnull=True)
+
+    def process_chunk(self, rows):
+        content_addressed = is_content_addressed('profile')
+        for user_id, profile_image in rows:
+            create_profile_image_variants.delay(
+                user_id, profile_image, None, content_addressed)
+
+
+@cron()
+def make_missing_profile_image_variants():
+    processed = ProfileImageVariantsJob().run()
+    logger.info("profile image variants queued for " + str(processed) +
+                " users")
+
+    return processed
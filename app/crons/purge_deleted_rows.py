@@ -0,0 +1,20 @@
+from celery.utils.log import get_task_logger
+from django.apps import apps
+from django.conf import settings
+
+from helpers.cron_helper import cron
+from helpers.purge import PurgeJob
+
+logger = get_task_logger(__name__)
+
+
+@cron()
+def purge_deleted_rows():
+    purged = 0
+    for label in getattr(settings, 'PURGE_MODELS', []):
+        job = PurgeJob(apps.get_model(label))
+        job.run()
+        logger.info("purged " + str(job.purged) + " rows of " + label)
+        purged += job.purged
+
+    return purged
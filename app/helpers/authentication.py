@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from helpers.local_cache import LocalCache, MISSING
+
+
+def get_verification_cache():
+    config = getattr(settings, 'JWT_VERIFICATION_CACHE', {})
+
+    return LocalCache(max_size=config.get('MAX_SIZE', 1024),
+                      timeout=config.get('TIMEOUT', 60))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which keeps the recently validated access
+    tokens in a per-process LRU, a token seen again within the
+    cache timeout skips the signature verification (but never
+    outlives its exp claim)
+    """
+    verified_tokens = get_verification_cache()
+
+    def get_validated_token(self, raw_token):
+        token = self.verified_tokens.get(raw_token)
+        if token is not MISSING and token['exp'] > time.time():
+            return token
+
+        token = super().get_validated_token(raw_token)
+        self.verified_tokens.set(raw_token, token)
+
+        return token
@@ -0,0 +1,136 @@
+from celery import chord
+from django.conf import settings
+
+from helpers.cache_adapter import CacheAdapter
+
+BATCH_JOB_CHECKPOINT_PREFIX = 'batch_job:checkpoint:'
+
+_jobs = {}
+
+
+def get_job(name):
+    """
+    Returns an instance of the batch job registered under name
+    """
+    return _jobs[name]()
+
+
+class BatchJob:
+    """
+    Base class of the jobs which walk a table chunk by chunk, the
+    rows are fetched with keyset pagination on id (id > last id of
+    the previous chunk) as tuples of the values of fields, which
+    starts with 'id', without instantiating models.
+
+    run() processes the chunks in the calling task and checkpoints
+    the last processed id in redis, a job which was killed resumes
+    after it. fan_out() processes every chunk in its own task, in
+    a chord which calls on_complete once all chunks are done.
+
+    Subclasses set a unique name, are registered by it and
+    implement get_queryset and process_chunk
+    """
+    name = None
+    fields = ('id',)
+    chunk_size = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name is not None:
+            _jobs[cls.name] = cls
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def process_chunk(self, rows):
+        """
+        Processes a list of tuples of the values of fields
+        """
+        raise NotImplementedError
+
+    def on_complete(self):
+        pass
+
+    def get_chunk_size(self):
+        if self.chunk_size is not None:
+            return self.chunk_size
+        return getattr(settings, 'BATCH_JOB_CHUNK_SIZE', 1000)
+
+    def get_checkpoint_key(self):
+        return BATCH_JOB_CHECKPOINT_PREFIX + self.name
+
+    def get_checkpoint(self):
+        """
+        Returns the last id processed by an unfinished run
+        """
+        return CacheAdapter().get(self.get_checkpoint_key())
+
+    def iter_chunks(self, after_id=None, fields=None):
+        """
+        Yields the rows of the queryset after after_id in chunks,
+        each chunk is one indexed range query on id
+        """
+        queryset = self.get_queryset().order_by('id').values_list(
+            *(fields or self.fields))
+        chunk_size = self.get_chunk_size()
+        while True:
+            chunk = queryset
+            if after_id is not None:
+                chunk = chunk.filter(id__gt=after_id)
+            rows = list(chunk[:chunk_size].iterator(chunk_size=chunk_size))
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            after_id = rows[-1][0]
+
+    def run(self):
+        """
+        Processes the chunks after the checkpoint one by one and
+        returns the number of rows processed
+        """
+        cache_adapter = CacheAdapter()
+        timeout = getattr(settings, 'BATCH_JOB_CHECKPOINT_TIMEOUT', None)
+        processed = 0
+        for rows in self.iter_chunks(self.get_checkpoint()):
+            self.process_chunk(rows)
+            processed += len(rows)
+            cache_adapter.set(self.get_checkpoint_key(), rows[-1][0], timeout)
+
+        cache_adapter.delete(self.get_checkpoint_key())
+        self.on_complete()
+
+        return processed
+
+    def process_range(self, first_id, last_id):
+        """
+        Processes the rows with first_id <= id <= last_id
+        """
+        rows = list(
+            self.get_queryset().filter(id__gte=first_id, id__lte=last_id)
+            .order_by('id').values_list(*self.fields))
+        if rows:
+            self.process_chunk(rows)
+
+        return len(rows)
+
+    def fan_out(self):
+        """
+        Splits the queryset in id ranges of chunk_size rows, read
+        from the ids only, and processes them on the workers.
+        Returns the number of chunks
+        """
+        from worker.tasks import run_batch_job_range, complete_batch_job
+
+        ranges = [(ids[0][0], ids[-1][0])
+                  for ids in self.iter_chunks(fields=('id',))]
+        if not ranges:
+            self.on_complete()
+            return 0
+
+        chord(run_batch_job_range.s(self.name, first_id, last_id)
+              for first_id, last_id in ranges)(
+            complete_batch_job.si(self.name))
+
+        return len(ranges)
@@ -1,26 +1,492 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
 
+from helpers.local_cache import LocalCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+L1_INVALIDATION_CHANNEL = 'cache_adapter:l1_invalidate'
+
+# KEYS: value key, attempts key (optional)
+# ARGV: expected encoded value, max attempts, attempts timeout
+# returns 1 if the value matched and was deleted, 0 otherwise
+CONSUME_IF_EQUAL_SCRIPT = """
+if KEYS[2] then
+    local attempts = redis.call('INCR', KEYS[2])
+    if attempts == 1 then
+        redis.call('EXPIRE', KEYS[2], ARGV[3])
+    end
+    if attempts > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', unpack(KEYS))
+    return 1
+end
+return 0
+"""
+
+# KEYS: key
+# ARGV: expected encoded value, timeout in milliseconds
+# returns 1 if the value matched and its expiry was reset, 0 otherwise
+EXPIRE_IF_EQUAL_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: source list, destination list
+# ARGV: count
+# moves up to count values from the head of the source list to
+# the tail of the destination list, returns them
+MOVE_MANY_SCRIPT = """
+local values = redis.call('LRANGE', KEYS[1], 0, ARGV[1] - 1)
+if #values > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(values))
+    redis.call('LTRIM', KEYS[1], #values, -1)
+end
+return values
+"""
+
+_local_cache = None
+_local_cache_pid = None
+_local_cache_node = None
+_local_cache_lock = threading.Lock()
+
+
+def listen_for_invalidations(local_cache, node):
+    """
+    Evicts the keys published on the invalidation channel by
+    other processes from the local cache, runs forever in a daemon
+    thread. The local cache is cleared when resubscribing as
+    messages may have been missed while disconnected
+    """
+    reconnecting = False
+    while True:
+        try:
+            pubsub = cache.client.get_client(write=False).pubsub(
+                ignore_subscribe_messages=True)
+            pubsub.subscribe(L1_INVALIDATION_CHANNEL)
+            if reconnecting:
+                local_cache.clear()
+            reconnecting = True
+            for message in pubsub.listen():
+                sender, key = message['data'].decode().split(':', 1)
+                if sender != node:
+                    local_cache.delete(key)
+        except Exception:
+            logger.exception('L1 invalidation listener disconnected')
+            time.sleep(1)
+
+
+def get_local_cache():
+    """
+    Returns the local cache of this process, it is created and
+    its invalidation listener is started on first use (and again
+    in forked children)
+    """
+    global _local_cache, _local_cache_pid, _local_cache_node
+    if _local_cache_pid != os.getpid():
+        with _local_cache_lock:
+            if _local_cache_pid != os.getpid():
+                config = getattr(settings, 'CACHE_L1', {})
+                _local_cache = LocalCache(
+                    max_size=config.get('MAX_SIZE', 1024),
+                    timeout=config.get('TIMEOUT', 30))
+                _local_cache_node = uuid.uuid4().hex
+                threading.Thread(
+                    target=listen_for_invalidations,
+                    args=(_local_cache, _local_cache_node),
+                    daemon=True).start()
+                _local_cache_pid = os.getpid()
+
+    return _local_cache
+
+
+class CachePipeline:
+    """
+    Queues the commands issued on it and sends them to redis
+    in a single round-trip when the with block exits, the
+    return values are available in results in the same order
+    """
+
+    def __init__(self, adapter, transaction=False):
+        self._adapter = adapter
+        self._client = cache.client
+        self._pipeline = self._client.get_client(write=True).pipeline(
+            transaction=transaction)
+        self._decoders = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self._pipeline.reset()
+
+    def _queue(self, decoder=None):
+        self._decoders.append(decoder or (lambda value: value))
+
+    def _decode(self, value):
+        return None if value is None else self._client.decode(value)
+
+    def _invalidate(self, key):
+        """
+        Evicts key from the local cache of every process if it
+        is cached in process, the publish result is not returned
+        """
+        local_cache = self._adapter.get_local_cache(key)
+        if local_cache is not None:
+            local_cache.delete(key)
+            self._pipeline.publish(
+                L1_INVALIDATION_CHANNEL, _local_cache_node + ':' + key)
+            self._decoders.append(None)
+
+    def get(self, key):
+        self._pipeline.get(self._client.make_key(key))
+        self._queue(self._decode)
+
+    def set(self, key, value, timeout=None):
+        self._client.set(key, value, timeout, client=self._pipeline)
+        self._queue(bool)
+        self._invalidate(key)
+
+    def set_if_missing(self, key, value, timeout=None):
+        """
+        Sets the value only if the key does not exist (SET NX)
+        """
+        self._client.set(
+            key, value, timeout, client=self._pipeline, nx=True)
+        self._queue(bool)
+        self._invalidate(key)
+
+    def delete(self, key):
+        self._client.delete(key, client=self._pipeline)
+        self._queue(bool)
+        self._invalidate(key)
+
+    def incr(self, key, delta=1):
+        self._pipeline.incrby(self._client.make_key(key), delta)
+        self._queue()
+        self._invalidate(key)
+
+    def expire(self, key, timeout):
+        self._pipeline.expire(self._client.make_key(key), timeout)
+        self._queue(bool)
+
+    def execute(self):
+        """
+        Sends the queued commands, returns their decoded results
+        """
+        if not self._decoders:
+            self.results = []
+            return self.results
+
+        values = self._pipeline.execute()
+        self._adapter.record_round_trip(len(values))
+        self.results = [
+            decode(value) for decode, value in zip(self._decoders, values)
+            if decode is not None]
+        self._decoders = []
+
+        return self.results
+
 
 class CacheAdapter:
     """
     A class which serves as an adapter for Cache
+
+    Keys starting with one of settings.CACHE_L1['PREFIXES'] are
+    also kept in a per-process LRU (L1) in front of redis (L2),
+    writes to them evict the key from the L1 of every process
     """
 
+    _stats = Counter()
+    _stats_lock = threading.Lock()
+
+    @classmethod
+    def record_round_trip(cls, commands=1):
+        """
+        Counts one round-trip to redis which carried
+        the given number of commands
+        """
+        with cls._stats_lock:
+            cls._stats['round_trips'] += 1
+            cls._stats['commands'] += commands
+            cls._stats['round_trips_saved'] += commands - 1
+
+    @classmethod
+    def record_lookups(cls, hits, misses):
+        """
+        Counts the keys found and not found in redis
+        """
+        with cls._stats_lock:
+            cls._stats['l2_hits'] += hits
+            cls._stats['l2_misses'] += misses
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns the round-trip counters and the hit/miss
+        counters of both tiers of this process
+        """
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+
+        if _local_cache_pid == os.getpid():
+            for name, value in _local_cache.stats.items():
+                stats['l1_' + name] = value
+
+        return stats
+
+    def get_local_cache(self, key):
+        """
+        Returns the local cache if key is cached in process,
+        None otherwise
+        """
+        prefixes = tuple(getattr(settings, 'CACHE_L1', {}).get(
+            'PREFIXES', ()))
+        if prefixes and key.startswith(prefixes):
+            return get_local_cache()
+
+        return None
+
     def get(self, key):
         """
         Returns the set value
         """
-        return cache.get(key)
+        local_cache = self.get_local_cache(key)
+        if local_cache is not None:
+            value = local_cache.get(key)
+            if value is not MISSING:
+                return value
+
+        self.record_round_trip()
+        value = cache.get(key)
+        self.record_lookups(int(value is not None), int(value is None))
+        if local_cache is not None and value is not None:
+            local_cache.set(key, value)
+
+        return value
 
     def set(self, key, value, timeout=None):
         """
         Expiration time is in seconds, sets the value
         in cache
         """
+        if self.get_local_cache(key) is not None:
+            with self.pipeline() as pipe:
+                pipe.set(key, value, timeout)
+            return
+
+        self.record_round_trip()
         cache.set(key, value, timeout)
 
     def delete(self, key):
         """
         Deletes a specific key from cache
         """
+        if self.get_local_cache(key) is not None:
+            with self.pipeline() as pipe:
+                pipe.delete(key)
+            return
+
+        self.record_round_trip()
         cache.delete(key)
+
+    def add(self, key, value, timeout=None):
+        """
+        Sets the value only if key does not exist, returns
+        True if it was set
+        """
+        with self.pipeline() as pipe:
+            pipe.set_if_missing(key, value, timeout)
+
+        return pipe.results[0]
+
+    def get_many(self, keys):
+        """
+        Returns a dict of the keys found in cache
+        with their values, fetched with one MGET
+        """
+        values = {}
+        remote_keys = []
+        for key in keys:
+            local_cache = self.get_local_cache(key)
+            value = MISSING if local_cache is None else local_cache.get(key)
+            if value is MISSING:
+                remote_keys.append(key)
+            else:
+                values[key] = value
+
+        if not remote_keys:
+            return values
+
+        self.record_round_trip(len(remote_keys))
+        remote_values = cache.get_many(remote_keys)
+        self.record_lookups(
+            len(remote_values), len(remote_keys) - len(remote_values))
+        for key, value in remote_values.items():
+            local_cache = self.get_local_cache(key)
+            if local_cache is not None:
+                local_cache.set(key, value)
+        values.update(remote_values)
+
+        return values
+
+    def set_many(self, data, timeout=None):
+        """
+        Sets all the key/values of data in one round-trip, timeout
+        is either the expiration time in seconds for every key or
+        a dict with the expiration time of each key
+        """
+        with self.pipeline() as pipe:
+            for key, value in data.items():
+                if isinstance(timeout, dict):
+                    pipe.set(key, value, timeout.get(key))
+                else:
+                    pipe.set(key, value, timeout)
+
+    def delete_many(self, keys):
+        """
+        Deletes the given keys from cache in one round-trip
+        """
+        with self.pipeline() as pipe:
+            for key in keys:
+                pipe.delete(key)
+
+    def incr(self, key, delta=1, timeout=None):
+        """
+        Atomically increments the counter at key and returns
+        the new value, a missing key starts at 0 and expires
+        after timeout seconds from its creation
+        """
+        with self.pipeline(transaction=True) as pipe:
+            if timeout is not None:
+                pipe.set_if_missing(key, 0, timeout)
+            pipe.incr(key, delta)
+
+        return pipe.results[-1]
+
+    def consume_if_equal(self, key, value, attempts_key=None,
+                         max_attempts=None, attempts_timeout=None):
+        """
+        Atomically deletes key if its value equals value (of the
+        same type as the stored one) and returns True, in a single
+        round-trip. If attempts_key is given the attempt is counted
+        on it, after max_attempts attempts within attempts_timeout
+        seconds nothing is consumed until the counter expires
+        """
+        client = cache.client
+        keys = [client.make_key(key)]
+        args = [client.encode(value)]
+        if attempts_key is not None:
+            keys.append(client.make_key(attempts_key))
+            args += [max_attempts, attempts_timeout]
+
+        script = client.get_client(write=True).register_script(
+            CONSUME_IF_EQUAL_SCRIPT)
+        self.record_round_trip()
+
+        return script(keys=keys, args=args) == 1
+
+    def expire_if_equal(self, key, value, timeout):
+        """
+        Atomically resets the expiration time of key to timeout
+        seconds if its value equals value, returns True if it did
+        """
+        client = cache.client
+        script = client.get_client(write=True).register_script(
+            EXPIRE_IF_EQUAL_SCRIPT)
+        self.record_round_trip()
+
+        return script(keys=[client.make_key(key)],
+                      args=[client.encode(value), int(timeout * 1000)]) == 1
+
+    def push_many(self, key, values):
+        """
+        Appends the values to the list at key in one
+        round-trip, returns the new length of the list
+        """
+        client = cache.client
+        self.record_round_trip()
+
+        return client.get_client(write=True).rpush(
+            client.make_key(key), *[client.encode(value) for value in values])
+
+    def get_list(self, key, count):
+        """
+        Returns up to count values from the head of the
+        list at key, without removing them
+        """
+        client = cache.client
+        self.record_round_trip()
+
+        return [client.decode(value) for value in
+                client.get_client(write=False).lrange(
+                    client.make_key(key), 0, count - 1)]
+
+    def move_many(self, source, destination, count):
+        """
+        Atomically moves up to count values from the head of the
+        list at source to the tail of the list at destination,
+        returns the moved values
+        """
+        client = cache.client
+        script = client.get_client(write=True).register_script(
+            MOVE_MANY_SCRIPT)
+        self.record_round_trip()
+
+        return [client.decode(value) for value in script(
+            keys=[client.make_key(source), client.make_key(destination)],
+            args=[count])]
+
+    def trim_many(self, key, count):
+        """
+        Removes the first count values of the list at key
+        """
+        client = cache.client
+        self.record_round_trip()
+        client.get_client(write=True).ltrim(client.make_key(key), count, -1)
+
+    def pipeline(self, transaction=False):
+        """
+        Returns a context manager which batches the commands
+        issued inside it into a single round-trip
+        """
+        return CachePipeline(self, transaction=transaction)
+
+    # The redis client behind django_redis (redis-py 3.x) has no
+    # asyncio support, so the awaitable variants run the blocking
+    # call in a worker thread and never block the event loop.
+
+    async def aget(self, key):
+        """
+        Awaitable version of get
+        """
+        return await sync_to_async(self.get)(key)
+
+    async def aset(self, key, value, timeout=None):
+        """
+        Awaitable version of set
+        """
+        await sync_to_async(self.set)(key, value, timeout)
+
+    async def adelete(self, key):
+        """
+        Awaitable version of delete
+        """
+        await sync_to_async(self.delete)(key)
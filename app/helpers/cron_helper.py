@@ -0,0 +1,140 @@
+import logging
+import random
+import threading
+import time
+import uuid
+
+from celery import Task
+from django.conf import settings
+from django.utils import timezone
+
+from helpers.cache_adapter import CacheAdapter
+
+logger = logging.getLogger(__name__)
+
+CRON_LOCK_PREFIX = 'cron:lock:'
+CRON_PENDING_PREFIX = 'cron:pending:'
+CRON_LAST_RUN_PREFIX = 'cron:last_run:'
+
+# what a run does while another run of the same cron holds the lock
+OVERLAP_SKIP = 'skip'
+OVERLAP_COALESCE = 'coalesce'
+
+
+class CronTask(Task):
+    """
+    Base class of the crons, a run holds a lease lock in redis
+    which is renewed by a heartbeat while it runs, so a run
+    never overlaps another run of the same cron on any worker.
+
+    A run finding the lock taken is skipped, with
+    overlap=OVERLAP_COALESCE it asks the running one to run once
+    more when it is done, however many runs were skipped meanwhile.
+
+    Every publish, from beat included, is delayed by a random
+    countdown of up to jitter seconds
+    """
+    lease = None
+    jitter = None
+    overlap = OVERLAP_SKIP
+
+    def get_lease(self):
+        if self.lease is not None:
+            return self.lease
+        return getattr(settings, 'CRON_LOCK_LEASE', 60)
+
+    def get_jitter(self):
+        if self.jitter is not None:
+            return self.jitter
+        return getattr(settings, 'CRON_JITTER', 10)
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        jitter = self.get_jitter()
+        if jitter and 'countdown' not in options and 'eta' not in options:
+            options['countdown'] = random.uniform(0, jitter)
+
+        return super().apply_async(args, kwargs, **options)
+
+    def heartbeat(self, key, token, stop):
+        """
+        Renews the lease every third of it until stop is set,
+        runs in a daemon thread next to the cron
+        """
+        lease = self.get_lease()
+        cache_adapter = CacheAdapter()
+        while not stop.wait(lease / 3):
+            if not cache_adapter.expire_if_equal(key, token, lease):
+                logger.error("cron lost its lock - " + self.name)
+                return
+
+    def record_run(self, started_at, duration, succeeded):
+        CacheAdapter().set(CRON_LAST_RUN_PREFIX + self.name, {
+            'started_at': started_at.isoformat(),
+            'duration': duration,
+            'succeeded': succeeded,
+        }, None)
+
+    def __call__(self, *args, **kwargs):
+        cache_adapter = CacheAdapter()
+        key = CRON_LOCK_PREFIX + self.name
+        pending_key = CRON_PENDING_PREFIX + self.name
+        token = uuid.uuid4().hex
+        if not cache_adapter.add(key, token, self.get_lease()):
+            if self.overlap == OVERLAP_COALESCE:
+                # kept until the running one is done, however long
+                cache_adapter.set(pending_key, 1, None)
+            logger.info("cron is already running, skipped - " + self.name)
+            return None
+
+        stop = threading.Event()
+        threading.Thread(
+            target=self.heartbeat, args=(key, token, stop), daemon=True
+        ).start()
+        try:
+            # this run covers the runs skipped before it
+            cache_adapter.delete(pending_key)
+            while True:
+                started_at = timezone.now()
+                start = time.perf_counter()
+                succeeded = False
+                try:
+                    result = super().__call__(*args, **kwargs)
+                    succeeded = True
+                finally:
+                    self.record_run(
+                        started_at, time.perf_counter() - start, succeeded)
+
+                if self.overlap != OVERLAP_COALESCE or \
+                        not cache_adapter.consume_if_equal(pending_key, 1):
+                    return result
+                logger.info("running skipped cron once more - " + self.name)
+        finally:
+            stop.set()
+            cache_adapter.consume_if_equal(key, token)
+            # a run skipped after the last check is published again
+            if self.overlap == OVERLAP_COALESCE and \
+                    cache_adapter.consume_if_equal(pending_key, 1):
+                self.apply_async(args, kwargs)
+
+
+def get_last_run(name):
+    """
+    Returns the start time, duration in seconds and outcome
+    of the last run of the cron, None if it never ran
+    """
+    return CacheAdapter().get(CRON_LAST_RUN_PREFIX + name)
+
+
+def cron(lease=None, jitter=None, overlap=OVERLAP_SKIP, **options):
+    """
+    Registers the decorated function as a cron task (see CronTask),
+    lease and jitter default to settings.CRON_LOCK_LEASE and
+    settings.CRON_JITTER, in seconds
+    """
+    from worker.worker import app
+
+    def decorator(func):
+        return app.task(base=CronTask, lease=lease, jitter=jitter,
+                        overlap=overlap, **options)(func)
+
+    return decorator
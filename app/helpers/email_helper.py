@@ -0,0 +1,98 @@
+import logging
+import os
+import smtplib
+import threading
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+_connection = None
+_connection_pid = None
+_connection_lock = threading.Lock()
+
+
+def get_mail_connection():
+    """
+    Returns the email connection of this process, it is created
+    on first use (and again in forked children). The SMTP session
+    is opened by the first send_messages and kept open afterwards
+    """
+    global _connection, _connection_pid
+    if _connection_pid != os.getpid():
+        with _connection_lock:
+            if _connection_pid != os.getpid():
+                _connection = get_connection(fail_silently=False)
+                _connection_pid = os.getpid()
+
+    return _connection
+
+
+def close_mail_connection():
+    """
+    Closes the SMTP session of this process, the next send
+    opens a new one
+    """
+    if _connection_pid == os.getpid():
+        with _connection_lock:
+            _connection.close()
+
+
+def is_rejected(exc):
+    """
+    Returns True if the server refused the message itself (5xx),
+    sending it again would fail the same way. A refused sender or
+    a failed login concerns every message and is not a rejection
+    """
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, (smtplib.SMTPSenderRefused,
+                        smtplib.SMTPAuthenticationError)):
+        return False
+
+    return isinstance(exc, smtplib.SMTPResponseException) and \
+        exc.smtp_code >= 500
+
+
+def send_message(connection, message):
+    """
+    Sends a message over the connection, the session is reopened
+    once if the server has dropped it
+    """
+    try:
+        # a session opened by send_messages itself is closed
+        # when it returns, an opened one is kept
+        connection.open()
+        connection.send_messages([message])
+    except (smtplib.SMTPServerDisconnected, ConnectionError):
+        # idle sessions are closed by the server
+        connection.close()
+        connection.open()
+        connection.send_messages([message])
+
+
+def send_messages(messages):
+    """
+    Sends the EmailMessages in order over the SMTP session of this
+    process. A message rejected by the server is skipped, sending
+    stops at the first other failure. Returns the number of messages
+    sent and the list of the rejected ones, the messages after those
+    (messages[sent + len(rejected):]) were not sent
+    """
+    connection = get_mail_connection()
+    sent = 0
+    rejected = []
+    with _connection_lock:
+        for message in messages:
+            try:
+                send_message(connection, message)
+            except (smtplib.SMTPException, OSError) as exc:
+                if not is_rejected(exc):
+                    logger.exception('Could not send email')
+                    break
+                logger.exception('Email rejected')
+                rejected.append(message)
+                continue
+            sent += 1
+
+    return sent, rejected
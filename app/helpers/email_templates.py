@@ -0,0 +1,108 @@
+import os
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template import Context, Engine, Library
+from django.utils.safestring import mark_safe
+
+from helpers.local_cache import LocalCache, MISSING
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+register = Library()
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(cached=True):
+    """
+    Returns a template engine for emails, with cached=True every
+    template is compiled once and kept in memory and the output
+    of the fragment tag is kept in a bounded LRU
+    """
+    loaders = TEMPLATE_LOADERS
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+
+    engine = Engine(
+        dirs=settings.TEMPLATES[0]['DIRS'], loaders=loaders,
+        libraries={'email': 'helpers.email_templates'})
+    engine.fragments = LocalCache(
+        max_size=getattr(settings, 'EMAIL_FRAGMENT_CACHE_SIZE', 128),
+        timeout=24 * 60 * 60) if cached else None
+
+    return engine
+
+
+def get_engine():
+    """
+    Returns the email template engine of this process, it is
+    created on first use (and again in forked children)
+    """
+    global _engine, _engine_pid
+    if _engine_pid != os.getpid():
+        with _engine_lock:
+            if _engine_pid != os.getpid():
+                _engine = create_engine()
+                _engine_pid = os.getpid()
+
+    return _engine
+
+
+def precompile_templates():
+    """
+    Compiles the text and html templates of every email of
+    settings.EMAIL_TEMPLATES, called when the worker starts
+    """
+    engine = get_engine()
+    for template_name in getattr(settings, 'EMAIL_TEMPLATES', []):
+        engine.get_template(template_name + '.txt')
+        engine.get_template(template_name + '.html')
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, template_name):
+    """
+    Renders a template which does not depend on the context,
+    the output is rendered once and then taken from the LRU
+    of the engine
+    """
+    engine = context.template.engine
+    output = MISSING
+    if engine.fragments is not None:
+        output = engine.fragments.get(template_name)
+
+    if output is MISSING:
+        output = engine.get_template(template_name).render(Context())
+        if engine.fragments is not None:
+            engine.fragments.set(template_name, output)
+
+    return mark_safe(output)
+
+
+def render_email(template_name, subject, context, from_email, to,
+                 engine=None):
+    """
+    Renders the text and html templates of an email and returns
+    the multipart message
+    """
+    if engine is None:
+        engine = get_engine()
+
+    message = EmailMultiAlternatives(
+        subject,
+        engine.get_template(template_name + '.txt').render(Context(context)),
+        from_email,
+        to)
+    message.attach_alternative(
+        engine.get_template(template_name + '.html').render(
+            Context(context)),
+        'text/html')
+
+    return message
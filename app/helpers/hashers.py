@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def get_cost(algorithm, name, default):
+    """
+    Returns a cost parameter of a hasher from
+    settings.PASSWORD_HASHER_COST
+    """
+    cost = getattr(settings, 'PASSWORD_HASHER_COST', {})
+
+    return cost.get(algorithm, {}).get(name, default)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2 hasher whose cost is configured in settings, hashes made
+    with another cost (or hasher) are upgraded on the next login
+    """
+
+    @property
+    def time_cost(self):
+        return get_cost(self.algorithm, 'time_cost', 2)
+
+    @property
+    def memory_cost(self):
+        return get_cost(self.algorithm, 'memory_cost', 512)
+
+    @property
+    def parallelism(self):
+        return get_cost(self.algorithm, 'parallelism', 2)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose number of iterations is configured in settings
+    """
+
+    @property
+    def iterations(self):
+        return get_cost(self.algorithm, 'iterations', 150000)
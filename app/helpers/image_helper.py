@@ -0,0 +1,135 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from helpers.s3_helper import upload_bytes_to_aws
+
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_processing_pool():
+    """
+    Returns the process pool used for encoding image variants,
+    the pool is created once per process on first use (and again
+    in forked children), returns None if
+    settings.IMAGE_PROCESSING_WORKERS is 0
+    """
+    global _pool, _pool_pid
+    workers = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 0)
+    if workers == 0:
+        return None
+
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(max_workers=workers)
+                _pool_pid = os.getpid()
+
+    return _pool
+
+
+def get_variant_key(s3_upload_path, size, image_format):
+    """
+    Returns the s3 path of a variant of an uploaded image,
+    profile/abc.png -> profile/abc/256.webp
+    """
+    return os.path.splitext(s3_upload_path)[0] + '/' + str(size) + \
+        '.' + image_format.lower()
+
+
+def decode_square(path, size):
+    """
+    Decodes the image at path once, applies its EXIF orientation
+    and returns it center cropped to a size x size RGB square
+    """
+    with Image.open(path) as image:
+        # lets JPEGs decode straight at a reduced scale
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    return ImageOps.fit(image, (size, size), Image.LANCZOS)
+
+
+def encode_variant(pixels, source_size, size, image_format, quality):
+    """
+    Resizes the raw RGB pixels of a square image to size and
+    returns it encoded in image_format, runs in the pool
+    """
+    image = Image.frombytes('RGB', source_size, pixels)
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, image_format, quality=quality)
+
+    return output.getvalue()
+
+
+def make_variants(path):
+    """
+    Returns a dict of (size, format) -> encoded bytes for every
+    size and format of settings.PROFILE_IMAGE_VARIANTS, the source
+    is decoded once and the variants are encoded in parallel
+    """
+    config = getattr(settings, 'PROFILE_IMAGE_VARIANTS')
+    image = decode_square(path, max(config['SIZES']))
+    pixels = image.tobytes()
+    jobs = [
+        (size, image_format)
+        for size in config['SIZES'] for image_format in config['FORMATS']
+    ]
+
+    pool = get_processing_pool()
+    if pool is None:
+        results = [
+            encode_variant(pixels, image.size, size, image_format,
+                           config['QUALITY'])
+            for size, image_format in jobs
+        ]
+    else:
+        futures = [
+            pool.submit(encode_variant, pixels, image.size, size,
+                        image_format, config['QUALITY'])
+            for size, image_format in jobs
+        ]
+        results = [future.result() for future in futures]
+
+    return dict(zip(jobs, results))
+
+
+def upload_variants(s3_upload_path, variants, cache_control=None):
+    """
+    Uploads the variants returned by make_variants next to the
+    original image concurrently, returns a dict of
+    "<size>.<format>" -> s3 path
+    """
+    keys = {
+        (size, image_format): get_variant_key(
+            s3_upload_path, size, image_format)
+        for size, image_format in variants
+    }
+    with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+        futures = [
+            executor.submit(upload_bytes_to_aws, data, keys[variant],
+                            CONTENT_TYPES[variant[1]], cache_control)
+            for variant, data in variants.items()
+        ]
+        for future in futures:
+            future.result()
+
+    return {
+        str(size) + '.' + image_format.lower(): key
+        for (size, image_format), key in keys.items()
+    }
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    A bounded, thread safe, in-process LRU cache whose
+    entries expire timeout seconds after being set
+    """
+
+    def __init__(self, max_size=1024, timeout=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def get(self, key, default=MISSING):
+        """
+        Returns the value of key, or default if it is
+        missing or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+
+            return value
+
+    def set(self, key, value):
+        """
+        Stores the value, evicting the least recently used
+        entries beyond max_size
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from kombu.exceptions import OperationalError
+
+from core.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, args=(), kwargs=None, **options):
+    """
+    Writes a task to the outbox instead of publishing it to the
+    broker, called inside the transaction of the change the task
+    belongs to so that both are committed or rolled back together.
+    The options are those of apply_async (countdown, priority, ..)
+    """
+    return OutboxMessage.objects.create(
+        task_name=task.name, args=list(args), kwargs=kwargs or {},
+        options=options)
+
+
+def relay_messages(batch_size=None):
+    """
+    Publishes up to batch_size outbox messages, oldest first, over
+    one producer and deletes them once the broker has confirmed
+    them. Rows locked by another relay are skipped. Connecting and
+    publishing are retried OUTBOX_PUBLISH_MAX_RETRIES times, so an
+    unreachable broker ends the run instead of holding the row
+    locks, the messages left are published by the next run.
+    A message which can not be published is marked with its error.
+    Returns the number of published messages
+    """
+    from worker.worker import app
+
+    if batch_size is None:
+        batch_size = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    max_retries = getattr(settings, 'OUTBOX_PUBLISH_MAX_RETRIES', 3)
+    retry_policy = {'max_retries': max_retries, 'interval_start': 0,
+                    'interval_step': 0.5, 'interval_max': 2}
+
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(error__isnull=True).order_by('id')[:batch_size])
+        if not messages:
+            return 0
+
+        published = []
+        try:
+            with app.producer_or_acquire() as producer:
+                producer.connection.ensure_connection(**retry_policy)
+                for message in messages:
+                    try:
+                        app.tasks[message.task_name].apply_async(
+                            message.args, message.kwargs, producer=producer,
+                            retry=True, retry_policy=retry_policy,
+                            **message.options)
+                    except (OperationalError, OSError):
+                        raise
+                    except Exception as exc:
+                        logger.exception("outbox message can not be "
+                                         "published - " + str(message))
+                        message.error = repr(exc)
+                        message.save(update_fields=['error'])
+                        continue
+                    published.append(message.id)
+        except (OperationalError, OSError):
+            logger.exception("outbox relay failed after " +
+                             str(len(published)) + " messages")
+
+        OutboxMessage.objects.filter(id__in=published).delete()
+
+    return len(published)
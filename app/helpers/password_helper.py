@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """
+    Returns the process pool used for hashing passwords, the pool
+    is created once per process on first use (and again in forked
+    children), returns None if settings.PASSWORD_HASHING_WORKERS is 0
+    """
+    global _pool, _pool_pid
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+    if workers == 0:
+        return None
+
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(max_workers=workers)
+                _pool_pid = os.getpid()
+
+    return _pool
+
+
+def verify_password(password, encoded):
+    """
+    Checks password against encoded, returns a tuple of whether it
+    is correct and the new hash if the hash has to be upgraded to
+    the preferred hasher or cost (None otherwise)
+    """
+    new_encoded = []
+    is_correct = hashers.check_password(
+        password, encoded,
+        setter=lambda raw: new_encoded.append(hashers.make_password(raw)))
+
+    return is_correct, (new_encoded[0] if new_encoded else None)
+
+
+def run_in_pool(func, *args):
+    """
+    Runs func in the hashing pool and waits for the result,
+    runs it inline if the pool is disabled
+    """
+    pool = get_hashing_pool()
+    if pool is None:
+        return func(*args)
+
+    return pool.submit(func, *args).result()
+
+
+async def run_in_pool_async(func, *args):
+    """
+    Awaitable version of run_in_pool
+    """
+    pool = get_hashing_pool()
+    if pool is None:
+        return func(*args)
+
+    return await asyncio.wrap_future(pool.submit(func, *args))
+
+
+def make_password(password):
+    """
+    Hashes a raw password off the calling thread
+    """
+    return run_in_pool(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+    """
+    Returns the result of verify_password computed off
+    the calling thread
+    """
+    return run_in_pool(verify_password, password, encoded)
+
+
+async def amake_password(password):
+    return await run_in_pool_async(hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    return await run_in_pool_async(verify_password, password, encoded)
+
+
+def make_passwords(passwords):
+    """
+    Hashes a list of raw passwords across the process pool,
+    returns the hashes in the same order as the input
+    """
+    passwords = list(passwords)
+    pool = get_hashing_pool()
+    if not passwords or pool is None:
+        return [hashers.make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // ((os.cpu_count() or 1) * 4))
+
+    return list(pool.map(
+        hashers.make_password, passwords, chunksize=chunksize))
@@ -0,0 +1,72 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ArchivedRow
+from helpers.batch_job import BatchJob
+
+
+class PurgeJob(BatchJob):
+    """
+    Moves the rows of a BaseModel soft deleted more than retention
+    ago out of their table, chunk by chunk. Each chunk is locked,
+    archived and deleted in its own short transaction, to the
+    ArchivedRow table or appended to a gzipped JSONL file if output
+    is given. Rows restored since the chunk was read are kept.
+
+    With a file a killed purge may archive the rows of its last
+    chunk twice, the archive table is written in the transaction
+    of the delete
+    """
+
+    def __init__(self, model, retention=None, chunk_size=None,
+                 output=None):
+        self.model = model
+        self.name = 'purge:' + model._meta.label_lower
+        if retention is None:
+            retention = timedelta(
+                days=getattr(settings, 'PURGE_RETENTION_DAYS', 30))
+        self.deleted_before = timezone.now() - retention
+        if chunk_size is None:
+            chunk_size = getattr(settings, 'PURGE_CHUNK_SIZE', 500)
+        self.chunk_size = chunk_size
+        self.output = output
+        self.purged = 0
+
+    def get_queryset(self):
+        return self.model._base_manager.filter(
+            is_deleted=True, deleted_at__lt=self.deleted_before)
+
+    def archive(self, rows):
+        if self.output is None:
+            ArchivedRow.objects.bulk_create([
+                ArchivedRow(model=self.model._meta.label_lower,
+                            row_id=row['id'], data=row,
+                            deleted_at=row['deleted_at'])
+                for row in rows
+            ])
+            return
+
+        with gzip.open(self.output, 'at') as output:
+            for row in rows:
+                output.write(json.dumps(
+                    {'model': self.model._meta.label_lower, 'data': row},
+                    cls=DjangoJSONEncoder) + '\n')
+
+    def process_chunk(self, rows):
+        fields = [field.attname for field in self.model._meta.concrete_fields]
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(
+                id__in=[row[0] for row in rows])
+            rows = list(
+                queryset.select_for_update().order_by('id').values(*fields))
+            if not rows:
+                return
+            self.archive(rows)
+            queryset.filter(id__in=[row['id'] for row in rows]).delete()
+            self.purged += len(rows)
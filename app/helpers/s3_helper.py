@@ -1,10 +1,221 @@
-from botocore.exceptions import NoCredentialsError
+import hashlib
+import mimetypes
+import os
+import shutil
+import threading
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
 from django.conf import settings
 
 import boto3
 
 from helpers.misc_helper import get_random_string
 
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+
+
+def create_s3_client():
+    """
+    Builds an s3 client with a connection pool sized for
+    concurrent uploads and retries of throttled/failed calls
+    """
+    session = boto3.session.Session(
+        aws_access_key_id=getattr(settings, 'AWS_ACCESS_KEY'),
+        aws_secret_access_key=getattr(settings, 'AWS_SECRET_KEY')
+    )
+
+    return session.client(
+        's3',
+        endpoint_url=getattr(settings, 'AWS_S3_ENDPOINT_URL', None),
+        config=Config(
+            max_pool_connections=getattr(
+                settings, 'AWS_S3_MAX_POOL_CONNECTIONS', 10),
+            connect_timeout=5,
+            read_timeout=60,
+            retries={'max_attempts': 3, 'mode': 'standard'}
+        )
+    )
+
+
+def get_s3_client():
+    """
+    Returns the s3 client of this process, it is created on first
+    use (and again in forked children) and is safe to share
+    between threads, so the credentials, endpoint and the kept
+    alive connections are reused by every upload
+    """
+    global _s3_client, _s3_client_pid
+    if _s3_client_pid != os.getpid():
+        with _s3_client_lock:
+            if _s3_client_pid != os.getpid():
+                _s3_client = create_s3_client()
+                _s3_client_pid = os.getpid()
+
+    return _s3_client
+
+
+def get_upload_path(file_name, folder='general'):
+    """
+    Returns a unique path on s3 for a file in the given folder
+    """
+    bucket_folders = getattr(settings, 'AWS_BUCKET_FOLDERS')
+
+    return bucket_folders[folder] + get_random_string(20) + file_name
+
+
+def is_content_addressed(folder):
+    """
+    Checks if the files of folder are stored under the digest
+    of their content (settings.AWS_S3_CONTENT_ADDRESSED_FOLDERS)
+    """
+    return folder in getattr(settings, 'AWS_S3_CONTENT_ADDRESSED_FOLDERS', ())
+
+
+def get_content_path(digest, file_name, folder='general'):
+    """
+    Returns the path on s3 of a content addressed file, files
+    with the same content and extension share the same path
+    """
+    bucket_folders = getattr(settings, 'AWS_BUCKET_FOLDERS')
+
+    return bucket_folders[folder] + digest + \
+        os.path.splitext(file_name)[1].lower()
+
+
+def get_spool_path(file_name):
+    """
+    Returns a unique path in the upload spool shared with the workers
+    """
+    spool_dir = getattr(settings, 'UPLOAD_SPOOL_DIR')
+    os.makedirs(spool_dir, exist_ok=True)
+
+    return os.path.join(
+        spool_dir, get_random_string(20) + '_' + os.path.basename(file_name))
+
+
+def stage_upload(file, folder='general'):
+    """
+    Saves an uploaded file in the upload spool shared with the
+    workers, so that it can be uploaded to s3 later by
+    upload_file_to_aws. Returns the path of the spooled file and
+    the path it will have on s3, the file is hashed while it is
+    spooled if the folder is content addressed
+    """
+    spool_path = get_spool_path(file.name)
+    if not is_content_addressed(folder):
+        if hasattr(file, 'temporary_file_path'):
+            # large uploads are already on disk, only move them
+            shutil.move(file.temporary_file_path(), spool_path)
+        else:
+            with open(spool_path, 'wb') as spool_file:
+                for chunk in file.chunks():
+                    spool_file.write(chunk)
+
+        return spool_path, get_upload_path(file.name, folder)
+
+    digest = hashlib.sha256()
+    with open(spool_path, 'wb') as spool_file:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            spool_file.write(chunk)
+
+    return spool_path, get_content_path(digest.hexdigest(), file.name, folder)
+
+
+def upload_file_to_aws(path, s3_upload_path, content_addressed=False):
+    """
+    Streams a file from disk to s3, files larger than
+    AWS_S3_MULTIPART_THRESHOLD are sent as a multipart upload
+    whose parts are sent (and retried) concurrently. A content
+    addressed file is not uploaded again if it is already on s3,
+    and is served with immutable cache headers. Returns False if
+    the upload was skipped, raises the boto exception if it fails
+    """
+    if content_addressed and get_uploaded_file(s3_upload_path) is not None:
+        return False
+
+    part_size = getattr(settings, 'AWS_S3_MULTIPART_THRESHOLD', 8388608)
+    transfer_config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS', 10))
+    extra_args = {}
+    content_type = mimetypes.guess_type(s3_upload_path)[0]
+    if content_type is not None:
+        extra_args['ContentType'] = content_type
+    if content_addressed:
+        extra_args['CacheControl'] = getattr(
+            settings, 'AWS_S3_IMMUTABLE_CACHE_CONTROL')
+
+    get_s3_client().upload_file(
+        path, getattr(settings, 'AWS_BUCKET'), s3_upload_path,
+        ExtraArgs=extra_args, Config=transfer_config)
+
+    return True
+
+
+def upload_bytes_to_aws(data, s3_upload_path, content_type,
+                        cache_control=None):
+    """
+    Uploads in-memory data to s3 with a single PUT
+    """
+    extra_args = {}
+    if cache_control is not None:
+        extra_args['CacheControl'] = cache_control
+
+    get_s3_client().put_object(
+        Bucket=getattr(settings, 'AWS_BUCKET'), Key=s3_upload_path,
+        Body=data, ContentType=content_type, **extra_args)
+
+
+def download_from_aws(s3_upload_path, path):
+    """
+    Streams a file from s3 to path on disk
+    """
+    get_s3_client().download_file(
+        getattr(settings, 'AWS_BUCKET'), s3_upload_path, path)
+
+
+def create_presigned_post(s3_upload_path, content_type, max_size,
+                          expires_in=300):
+    """
+    Returns the url and the form fields a client needs to upload
+    a file directly to s3 at s3_upload_path, s3 rejects the upload
+    if it is not of content_type or is larger than max_size bytes
+    """
+    return get_s3_client().generate_presigned_post(
+        Bucket=getattr(settings, 'AWS_BUCKET'),
+        Key=s3_upload_path,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ],
+        ExpiresIn=expires_in)
+
+
+def get_uploaded_file(s3_upload_path):
+    """
+    Returns the size and content type of a file on s3,
+    None if it does not exist
+    """
+    try:
+        response = get_s3_client().head_object(
+            Bucket=getattr(settings, 'AWS_BUCKET'), Key=s3_upload_path)
+    except ClientError as exc:
+        if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise
+
+    return {
+        'size': response['ContentLength'],
+        'content_type': response['ContentType'],
+    }
+
 
 def upload_to_aws(file, folder='general'):
     """
@@ -12,21 +223,21 @@ def upload_to_aws(file, folder='general'):
     it returns False, otherwise it returns the filepath
     of the uploaded file on s3
     """
-    aws_access_key = getattr(settings, 'AWS_ACCESS_KEY')
-    aws_secret_key = getattr(settings, 'AWS_SECRET_KEY')
-    bucket_folders = getattr(settings, 'AWS_BUCKET_FOLDERS')
     bucket = getattr(settings, 'AWS_BUCKET')
 
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-
     try:
-        s3_upload_path = bucket_folders[folder] + \
-            get_random_string(20) + file.name
-        s3.upload_fileobj(file, bucket, s3_upload_path)
+        if is_content_addressed(folder):
+            spool_path, s3_upload_path = stage_upload(file, folder)
+            try:
+                upload_file_to_aws(
+                    spool_path, s3_upload_path, content_addressed=True)
+            finally:
+                os.remove(spool_path)
+
+            return s3_upload_path
+
+        s3_upload_path = get_upload_path(file.name, folder)
+        get_s3_client().upload_fileobj(file, bucket, s3_upload_path)
 
         return s3_upload_path
     except FileNotFoundError:
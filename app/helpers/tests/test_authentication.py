@@ -0,0 +1,34 @@
+from functools import partial
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from helpers.authentication import CachedJWTAuthentication
+
+
+class CachedJWTAuthenticationTest(SimpleTestCase):
+    """
+    Tests the validated token cache of CachedJWTAuthentication
+    """
+
+    def test_token_validated_once(self):
+        """
+        Test if a token seen again is not validated again
+        """
+        token = AccessToken()
+        token['user_id'] = 1
+        raw_token = str(token).encode()
+        authentication = CachedJWTAuthentication()
+        validate_token = partial(
+            JWTAuthentication.get_validated_token, authentication)
+
+        with mock.patch.object(
+                JWTAuthentication, 'get_validated_token',
+                wraps=validate_token) as validate:
+            first = authentication.get_validated_token(raw_token)
+            second = authentication.get_validated_token(raw_token)
+
+        self.assertEqual(validate.call_count, 1)
+        self.assertEqual(first['jti'], second['jti'])
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from helpers.batch_job import BatchJob
+from helpers.cache_adapter import CacheAdapter
+
+processed = []
+completed = []
+
+
+class UserEmailsJob(BatchJob):
+    name = 'test_user_emails'
+    fields = ('id', 'email')
+    chunk_size = 2
+    fail_at = None
+
+    def get_queryset(self):
+        return get_user_model().objects.filter(is_deleted=False)
+
+    def process_chunk(self, rows):
+        if self.fail_at is not None and self.fail_at in dict(rows):
+            raise RuntimeError('killed')
+        processed.extend(email for _, email in rows)
+
+    def on_complete(self):
+        completed.append(self.name)
+
+
+class BatchJobTest(TestCase):
+    """
+    Tests walking a table chunk by chunk
+    """
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create(
+                email='user' + str(index) + '@test.com',
+                mobile_number=str(1234567000 + index),
+                is_deleted=index == 2)
+            for index in range(6)
+        ]
+        self.emails = [user.email for user in self.users
+                       if not user.is_deleted]
+        del processed[:]
+        del completed[:]
+
+    def tearDown(self):
+        CacheAdapter().delete(UserEmailsJob().get_checkpoint_key())
+
+    def test_run(self):
+        """
+        Test if every row is processed with a query per chunk
+        """
+        with self.assertNumQueries(3):
+            self.assertEqual(UserEmailsJob().run(), 5)
+
+        self.assertEqual(processed, self.emails)
+        self.assertEqual(completed, ['test_user_emails'])
+        self.assertIsNone(UserEmailsJob().get_checkpoint())
+
+    def test_run_resumes(self):
+        """
+        Test if a killed run resumes after the last processed chunk
+        """
+        job = UserEmailsJob()
+        job.fail_at = self.users[3].id
+        with self.assertRaises(RuntimeError):
+            job.run()
+
+        self.assertEqual(processed, self.emails[:2])
+        self.assertEqual(job.get_checkpoint(), self.users[1].id)
+        self.assertEqual(UserEmailsJob().run(), 3)
+        self.assertEqual(processed, self.emails)
+
+    def test_fan_out(self):
+        """
+        Test if the ranges are processed by a chord
+        """
+        self.assertEqual(UserEmailsJob().fan_out(), 3)
+
+        self.assertEqual(sorted(processed), sorted(self.emails))
+        self.assertEqual(completed, ['test_user_emails'])
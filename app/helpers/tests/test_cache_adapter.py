@@ -0,0 +1,241 @@
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from helpers.cache_adapter import CacheAdapter, L1_INVALIDATION_CHANNEL
+from helpers.local_cache import LocalCache, MISSING
+
+
+class CacheAdapterTest(SimpleTestCase):
+    """
+    Tests the batched and pipelined operations of CacheAdapter
+    """
+
+    keys = ['test_cache_a', 'test_cache_b', 'test_cache_c']
+
+    def setUp(self):
+        self.cache_adapter = CacheAdapter()
+
+    def tearDown(self):
+        cache.delete_many(self.keys)
+
+    def test_set_many_get_many(self):
+        """
+        Test if set_many/get_many round trip values and skip
+        the missing keys
+        """
+        self.cache_adapter.set_many(
+            {'test_cache_a': 'a', 'test_cache_b': {'b': 1}}, 60)
+
+        values = self.cache_adapter.get_many(self.keys)
+        self.assertEqual(values, {'test_cache_a': 'a',
+                                  'test_cache_b': {'b': 1}})
+
+    def test_set_many_per_key_timeout(self):
+        """
+        Test if set_many applies the timeout of each key
+        """
+        self.cache_adapter.set_many(
+            {'test_cache_a': 'a', 'test_cache_b': 'b'},
+            {'test_cache_a': 60, 'test_cache_b': None})
+
+        self.assertTrue(0 < cache.ttl('test_cache_a') <= 60)
+        self.assertIsNone(cache.ttl('test_cache_b'))
+
+    def test_delete_many(self):
+        """
+        Test if delete_many removes all the keys
+        """
+        self.cache_adapter.set_many({key: 1 for key in self.keys})
+        self.cache_adapter.delete_many(self.keys)
+
+        self.assertEqual(self.cache_adapter.get_many(self.keys), {})
+
+    def test_incr_with_timeout(self):
+        """
+        Test if incr creates the counter with a timeout
+        and increments it
+        """
+        self.assertEqual(self.cache_adapter.incr('test_cache_a', 1, 60), 1)
+        self.assertEqual(self.cache_adapter.incr('test_cache_a', 2, 60), 3)
+        self.assertEqual(self.cache_adapter.get('test_cache_a'), 3)
+        self.assertTrue(0 < cache.ttl('test_cache_a') <= 60)
+
+    def test_consume_if_equal(self):
+        """
+        Test if the value is deleted only when it matches
+        """
+        self.cache_adapter.set('test_cache_a', '123456', 60)
+
+        self.assertFalse(
+            self.cache_adapter.consume_if_equal('test_cache_a', '000000'))
+        self.assertTrue(
+            self.cache_adapter.consume_if_equal('test_cache_a', '123456'))
+        self.assertIsNone(self.cache_adapter.get('test_cache_a'))
+        self.assertFalse(
+            self.cache_adapter.consume_if_equal('test_cache_a', '123456'))
+
+    def test_consume_if_equal_attempts(self):
+        """
+        Test if nothing is consumed after max_attempts and
+        the counter is removed on success
+        """
+        self.cache_adapter.set('test_cache_a', '123456', 60)
+        params = {'attempts_key': 'test_cache_b', 'max_attempts': 2,
+                  'attempts_timeout': 60}
+
+        self.assertFalse(self.cache_adapter.consume_if_equal(
+            'test_cache_a', '000000', **params))
+        self.assertTrue(self.cache_adapter.consume_if_equal(
+            'test_cache_a', '123456', **params))
+        self.assertIsNone(self.cache_adapter.get('test_cache_b'))
+
+        self.cache_adapter.set('test_cache_a', '123456', 60)
+        for _ in range(2):
+            self.cache_adapter.consume_if_equal(
+                'test_cache_a', '000000', **params)
+        self.assertFalse(self.cache_adapter.consume_if_equal(
+            'test_cache_a', '123456', **params))
+        self.assertTrue(0 < cache.ttl('test_cache_b') <= 60)
+
+    def test_expire_if_equal(self):
+        """
+        Test if the expiry is reset only when the value matches
+        """
+        self.cache_adapter.set('test_cache_a', 'token', 10)
+
+        self.assertFalse(
+            self.cache_adapter.expire_if_equal('test_cache_a', 'other', 60))
+        self.assertTrue(cache.ttl('test_cache_a') <= 10)
+        self.assertTrue(
+            self.cache_adapter.expire_if_equal('test_cache_a', 'token', 60))
+        self.assertTrue(10 < cache.ttl('test_cache_a') <= 60)
+        self.assertFalse(
+            self.cache_adapter.expire_if_equal('test_cache_b', 'token', 60))
+
+    def test_pipeline_single_round_trip(self):
+        """
+        Test if the commands issued in a pipeline are sent
+        in one round-trip and their results are returned
+        """
+        self.cache_adapter.set('test_cache_a', 'a', 60)
+        before = CacheAdapter.get_stats()
+
+        with self.cache_adapter.pipeline() as pipe:
+            pipe.get('test_cache_a')
+            pipe.delete('test_cache_a')
+            pipe.get('test_cache_a')
+
+        after = CacheAdapter.get_stats()
+        self.assertEqual(pipe.results, ['a', True, None])
+        self.assertEqual(after['round_trips'] - before['round_trips'], 1)
+        self.assertEqual(after['round_trips_saved'] -
+                         before['round_trips_saved'], 2)
+
+    def test_push_many_move_many(self):
+        """
+        Test if values are moved in the order they were pushed
+        and removed from the head of the list
+        """
+        self.cache_adapter.push_many('test_cache_a', ['a', {'b': 1}])
+        self.cache_adapter.push_many('test_cache_a', ['c'])
+
+        self.assertEqual(
+            self.cache_adapter.move_many('test_cache_a', 'test_cache_b', 2),
+            ['a', {'b': 1}])
+        self.assertEqual(
+            self.cache_adapter.get_list('test_cache_a', 2), ['c'])
+        self.assertEqual(
+            self.cache_adapter.move_many('test_cache_a', 'test_cache_b', 2),
+            ['c'])
+        self.assertEqual(
+            self.cache_adapter.move_many('test_cache_a', 'test_cache_b', 2),
+            [])
+
+        self.cache_adapter.trim_many('test_cache_b', 1)
+        self.assertEqual(self.cache_adapter.get_list('test_cache_b', 5),
+                         [{'b': 1}, 'c'])
+
+
+@override_settings(CACHE_L1={'PREFIXES': ('test_l1_',)})
+class TwoTierCacheAdapterTest(SimpleTestCase):
+    """
+    Tests the in-process tier of CacheAdapter
+    """
+
+    def setUp(self):
+        self.cache_adapter = CacheAdapter()
+
+    def tearDown(self):
+        self.cache_adapter.delete_many(['test_l1_a', 'test_cache_a'])
+
+    def test_l1_hit_skips_redis(self):
+        """
+        Test if a key with an L1 prefix is served from
+        the process after the first read
+        """
+        self.cache_adapter.set('test_l1_a', 'a', 60)
+        self.assertEqual(self.cache_adapter.get('test_l1_a'), 'a')
+        before = CacheAdapter.get_stats()
+
+        self.assertEqual(self.cache_adapter.get('test_l1_a'), 'a')
+
+        after = CacheAdapter.get_stats()
+        self.assertEqual(after['round_trips'], before['round_trips'])
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+
+    def test_other_keys_stay_in_redis(self):
+        """
+        Test if keys without an L1 prefix always go to redis
+        """
+        self.cache_adapter.set('test_cache_a', 'a', 60)
+        self.cache_adapter.get('test_cache_a')
+        before = CacheAdapter.get_stats()
+
+        self.cache_adapter.get('test_cache_a')
+
+        after = CacheAdapter.get_stats()
+        self.assertEqual(after['round_trips'] - before['round_trips'], 1)
+
+    def test_invalidation_from_another_process(self):
+        """
+        Test if a published invalidation evicts the key
+        from the local tier
+        """
+        self.cache_adapter.set('test_l1_a', 'a', 60)
+        self.cache_adapter.get('test_l1_a')
+
+        cache.set('test_l1_a', 'b', 60)
+        cache.client.get_client().publish(
+            L1_INVALIDATION_CHANNEL, 'other_node:test_l1_a')
+
+        deadline = time.monotonic() + 2
+        while (self.cache_adapter.get('test_l1_a') != 'b' and
+               time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(self.cache_adapter.get('test_l1_a'), 'b')
+
+
+class LocalCacheTest(SimpleTestCase):
+    """
+    Tests the size and time based eviction of LocalCache
+    """
+
+    def test_evicts_least_recently_used(self):
+        local_cache = LocalCache(max_size=2, timeout=60)
+        local_cache.set('a', 1)
+        local_cache.set('b', 2)
+        local_cache.get('a')
+        local_cache.set('c', 3)
+
+        self.assertEqual(local_cache.get('a'), 1)
+        self.assertIs(local_cache.get('b'), MISSING)
+        self.assertEqual(local_cache.stats['evictions'], 1)
+
+    def test_expires_entries(self):
+        local_cache = LocalCache(max_size=2, timeout=0)
+        local_cache.set('a', 1)
+
+        self.assertIs(local_cache.get('a'), MISSING)
+        self.assertEqual(local_cache.stats['expired'], 1)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from celery import Task
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from helpers.cache_adapter import CacheAdapter
+from helpers.cron_helper import cron, get_last_run, CRON_LOCK_PREFIX, \
+    CRON_PENDING_PREFIX, CRON_LAST_RUN_PREFIX, OVERLAP_COALESCE
+
+calls = []
+pending_ttls = []
+
+
+@cron(name='test_cron', jitter=30)
+def test_cron(nested=False):
+    calls.append(nested)
+    if nested:
+        test_cron()
+
+    return len(calls)
+
+
+@cron(name='test_coalesced_cron', overlap=OVERLAP_COALESCE)
+def test_coalesced_cron(nested=False):
+    calls.append(nested)
+    # only the first run overlaps, the rerun has the same arguments
+    if nested and len(calls) == 1:
+        # skipped runs are coalesced into a single one
+        test_coalesced_cron()
+        test_coalesced_cron()
+        # and wait for the running one whatever its duration
+        pending_ttls.append(
+            cache.ttl(CRON_PENDING_PREFIX + 'test_coalesced_cron'))
+
+    return len(calls)
+
+
+class CronHelperTest(SimpleTestCase):
+    """
+    Tests the locking, coalescing and jitter of the crons
+    """
+
+    def setUp(self):
+        self.cache_adapter = CacheAdapter()
+        del calls[:]
+        del pending_ttls[:]
+
+    def tearDown(self):
+        keys = []
+        for name in ('test_cron', 'test_coalesced_cron'):
+            keys += [CRON_LOCK_PREFIX + name, CRON_PENDING_PREFIX + name,
+                     CRON_LAST_RUN_PREFIX + name]
+        self.cache_adapter.delete_many(keys)
+
+    def test_run(self):
+        """
+        Test if a run records its duration and releases the lock
+        """
+        self.assertEqual(test_cron(), 1)
+
+        last_run = get_last_run('test_cron')
+        self.assertTrue(last_run['succeeded'])
+        self.assertGreaterEqual(last_run['duration'], 0)
+        self.assertIsNone(
+            self.cache_adapter.get(CRON_LOCK_PREFIX + 'test_cron'))
+
+    def test_overlapping_run_skipped(self):
+        """
+        Test if a run is skipped while another one holds the lock
+        """
+        self.assertEqual(test_cron(nested=True), 1)
+        self.assertEqual(calls, [True])
+        self.assertIsNone(
+            self.cache_adapter.get(CRON_PENDING_PREFIX + 'test_cron'))
+
+    def test_overlapping_runs_coalesced(self):
+        """
+        Test if the skipped runs are run once after the running one
+        """
+        test_coalesced_cron(nested=True)
+
+        self.assertEqual(calls, [True, True])
+        self.assertEqual(pending_ttls, [None])
+        self.assertIsNone(self.cache_adapter.get(
+            CRON_PENDING_PREFIX + 'test_coalesced_cron'))
+        self.assertIsNone(self.cache_adapter.get(
+            CRON_LOCK_PREFIX + 'test_coalesced_cron'))
+
+    def test_jitter(self):
+        """
+        Test if a publish without countdown is delayed by the jitter
+        """
+        with mock.patch.object(Task, 'apply_async') as apply_async:
+            test_cron.apply_async()
+            test_cron.apply_async(countdown=5)
+
+        countdown = apply_async.call_args_list[0][1]['countdown']
+        self.assertTrue(0 <= countdown <= 30)
+        self.assertEqual(apply_async.call_args_list[1][1]['countdown'], 5)
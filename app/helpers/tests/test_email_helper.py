@@ -0,0 +1,78 @@
+import smtplib
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+
+from helpers import email_helper
+
+
+def get_message(index):
+    return EmailMessage('Subject', 'Body ' + str(index), 'from@test.com',
+                        ['to' + str(index) + '@test.com'])
+
+
+class EmailHelperTest(SimpleTestCase):
+    """
+    Tests sending emails over the connection of the process
+    """
+
+    def test_send_messages_reuses_connection(self):
+        """
+        Test if the same connection sends every message
+        """
+        connection = email_helper.get_mail_connection()
+        self.assertEqual(email_helper.send_messages(
+            [get_message(index) for index in range(3)]), (3, []))
+
+        self.assertIs(email_helper.get_mail_connection(), connection)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_send_messages_reconnects(self):
+        """
+        Test if a message is sent again once if the server
+        dropped the connection
+        """
+        connection = email_helper.get_mail_connection()
+        send = mock.Mock(side_effect=[
+            1, smtplib.SMTPServerDisconnected(), 1, 1])
+        with mock.patch.object(connection, 'send_messages', send), \
+                mock.patch.object(connection, 'close') as close:
+            sent, rejected = email_helper.send_messages(
+                [get_message(index) for index in range(3)])
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(send.call_count, 4)
+        close.assert_called_once_with()
+
+    def test_send_messages_stops_at_failure(self):
+        """
+        Test if the number of messages sent before a
+        temporary failure is returned
+        """
+        connection = email_helper.get_mail_connection()
+        send = mock.Mock(side_effect=[
+            1, smtplib.SMTPResponseException(451, b'Try again later'), 1])
+        with mock.patch.object(connection, 'send_messages', send):
+            sent, rejected = email_helper.send_messages(
+                [get_message(index) for index in range(3)])
+
+        self.assertEqual((sent, rejected), (1, []))
+        self.assertEqual(send.call_count, 2)
+
+    def test_send_messages_skips_rejected(self):
+        """
+        Test if a message refused by the server is returned
+        and the next ones are sent
+        """
+        messages = [get_message(index) for index in range(3)]
+        connection = email_helper.get_mail_connection()
+        send = mock.Mock(side_effect=[
+            1, smtplib.SMTPRecipientsRefused(
+                {'to1@test.com': (550, b'No such user')}), 1])
+        with mock.patch.object(connection, 'send_messages', send):
+            sent, rejected = email_helper.send_messages(messages)
+
+        self.assertEqual((sent, rejected), (2, [messages[1]]))
+        self.assertEqual(send.call_count, 3)
@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+
+from helpers import email_templates
+
+
+class EmailTemplatesTest(SimpleTestCase):
+    """
+    Tests the rendering of the email templates
+    """
+
+    def test_render_email_multipart(self):
+        """
+        Test if the text body is not escaped and the
+        html alternative is
+        """
+        message = email_templates.render_email(
+            'user/emails/welcome', 'Welcome!', {'name': "O'Brien <b>"},
+            'from@test.com', ['to@test.com'])
+
+        self.assertIn("Welcome to our side O'Brien <b>", message.body)
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, 'text/html')
+        self.assertIn('O&#39;Brien &lt;b&gt;', html)
+        self.assertIn('you have an account with us', html)
+
+    def test_fragment_rendered_once(self):
+        """
+        Test if a fragment is taken from the LRU after the
+        first render
+        """
+        engine = email_templates.create_engine()
+        for index in range(3):
+            message = email_templates.render_email(
+                'user/emails/welcome', 'Welcome!', {'name': str(index)},
+                'from@test.com', ['to@test.com'], engine=engine)
+            self.assertIn('you have an account with us', message.body)
+
+        self.assertEqual(engine.fragments.stats['misses'], 2)
+        self.assertEqual(engine.fragments.stats['hits'], 4)
+        self.assertEqual(len(engine.fragments), 2)
+
+    def test_precompile_templates(self):
+        """
+        Test if every configured email template compiles
+        """
+        email_templates.precompile_templates()
@@ -0,0 +1,52 @@
+import io
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from helpers import image_helper
+
+
+@override_settings(PROFILE_IMAGE_VARIANTS={
+    'SIZES': [32, 64], 'FORMATS': ['WEBP', 'JPEG'], 'QUALITY': 80})
+class ImageHelperTest(SimpleTestCase):
+    """
+    Tests the profile image variants helpers
+    """
+
+    def setUp(self):
+        self.image_file = tempfile.NamedTemporaryFile(suffix='.png')
+        Image.new('RGB', (300, 200), 'red').save(self.image_file, 'PNG')
+        self.image_file.flush()
+
+    def tearDown(self):
+        self.image_file.close()
+
+    def assert_variants(self, variants):
+        self.assertEqual(set(variants), {
+            (32, 'WEBP'), (32, 'JPEG'), (64, 'WEBP'), (64, 'JPEG')})
+        for (size, image_format), data in variants.items():
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(image.size, (size, size))
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=2)
+    def test_make_variants(self):
+        """
+        Test if every size and format is encoded in the pool
+        """
+        self.assert_variants(image_helper.make_variants(self.image_file.name))
+
+    def test_make_variants_without_pool(self):
+        """
+        Test if the variants are encoded inline by default
+        """
+        self.assert_variants(image_helper.make_variants(self.image_file.name))
+
+    def test_get_variant_key(self):
+        """
+        Test if the variants are stored next to the original
+        """
+        self.assertEqual(
+            image_helper.get_variant_key('profile/abc.png', 64, 'WEBP'),
+            'profile/abc/64.webp')
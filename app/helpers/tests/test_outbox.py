@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import TestCase
+from kombu.exceptions import OperationalError
+
+from core.models import OutboxMessage
+from helpers.outbox import enqueue, relay_messages
+from worker.tasks import send_reset_password_email
+
+
+class OutboxTest(TestCase):
+    """
+    Tests writing tasks to the outbox and relaying them
+    """
+
+    def test_enqueue(self):
+        """
+        Test if the task is written to the outbox with its options
+        """
+        enqueue(send_reset_password_email, ('test@test.com', 'link'),
+                countdown=10)
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'send_reset_password_email')
+        self.assertEqual(message.args, ['test@test.com', 'link'])
+        self.assertEqual(message.kwargs, {})
+        self.assertEqual(message.options, {'countdown': 10})
+
+    def test_relay_messages(self):
+        """
+        Test if the messages are published in order and deleted
+        """
+        for index in range(3):
+            enqueue(send_reset_password_email,
+                    ('test' + str(index) + '@test.com', 'link'))
+
+        with mock.patch.object(
+                send_reset_password_email, 'apply_async') as apply_async:
+            self.assertEqual(relay_messages(batch_size=2), 2)
+            self.assertEqual(OutboxMessage.objects.count(), 1)
+            self.assertEqual(relay_messages(batch_size=2), 1)
+
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertEqual(
+            [call[0][0][0] for call in apply_async.call_args_list],
+            ['test0@test.com', 'test1@test.com', 'test2@test.com'])
+
+    def test_relay_messages_broker_error(self):
+        """
+        Test if the messages not published when the broker
+        fails are kept for the next run
+        """
+        for index in range(3):
+            enqueue(send_reset_password_email,
+                    ('test' + str(index) + '@test.com', 'link'))
+
+        with mock.patch.object(
+                send_reset_password_email, 'apply_async',
+                side_effect=[None, OperationalError()]):
+            self.assertEqual(relay_messages(), 1)
+
+        self.assertEqual(
+            [message.args[0] for message in
+             OutboxMessage.objects.order_by('id')],
+            ['test1@test.com', 'test2@test.com'])
+
+    def test_relay_messages_unknown_task(self):
+        """
+        Test if a message which can not be published is marked
+        and does not block the ones after it
+        """
+        OutboxMessage.objects.create(task_name='unknown_task')
+        enqueue(send_reset_password_email, ('test@test.com', 'link'))
+
+        with mock.patch.object(
+                send_reset_password_email, 'apply_async') as apply_async:
+            self.assertEqual(relay_messages(), 1)
+            self.assertEqual(relay_messages(), 0)
+
+        apply_async.assert_called_once()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'unknown_task')
+        self.assertIn('never registered', message.error)
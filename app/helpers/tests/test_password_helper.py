@@ -0,0 +1,57 @@
+import asyncio
+
+from django.contrib.auth.hashers import make_password as django_make_password
+from django.test import SimpleTestCase, override_settings
+
+from helpers import password_helper
+
+
+class PasswordHelperTest(SimpleTestCase):
+    """
+    Tests the hashing pool helpers
+    """
+
+    def test_make_passwords(self):
+        """
+        Test if the passwords are hashed in order
+        """
+        hashes = password_helper.make_passwords(['a$1', 'b$2', 'c$3'])
+
+        self.assertEqual(len(hashes), 3)
+        self.assertTrue(password_helper.check_password('b$2', hashes[1])[0])
+        self.assertFalse(password_helper.check_password('a$1', hashes[1])[0])
+
+    def test_check_password_upgrade(self):
+        """
+        Test if a hash of an older hasher is upgraded
+        only when the password is correct
+        """
+        encoded = django_make_password('a$1', hasher='pbkdf2_sha1')
+
+        self.assertEqual(
+            password_helper.check_password('b$2', encoded), (False, None))
+        is_correct, new_encoded = password_helper.check_password(
+            'a$1', encoded)
+        self.assertTrue(is_correct)
+        self.assertTrue(new_encoded.startswith('argon2'))
+
+    def test_async_helpers(self):
+        """
+        Test if the awaitable helpers hash and check in the pool
+        """
+        async def hash_and_check():
+            encoded = await password_helper.amake_password('a$1')
+            return await password_helper.acheck_password('a$1', encoded)
+
+        result = asyncio.get_event_loop().run_until_complete(
+            hash_and_check())
+        self.assertEqual(result, (True, None))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_pool_disabled(self):
+        """
+        Test if the helpers work without the pool
+        """
+        self.assertIsNone(password_helper.get_hashing_pool())
+        encoded = password_helper.make_password('a$1')
+        self.assertTrue(password_helper.check_password('a$1', encoded)[0])
@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import ArchivedRow
+from helpers.purge import PurgeJob
+
+
+class PurgeJobTest(TestCase):
+    """
+    Tests archiving and deleting soft deleted rows
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create(email='user' + str(index) + '@test.com',
+                                mobile_number=str(1234567000 + index))
+            for index in range(5)
+        ]
+        # users 0-2 were deleted 40 days ago, user 3 yesterday
+        User.objects.filter(id__in=[user.id for user in self.users[:3]]) \
+            .update(is_deleted=True,
+                    deleted_at=timezone.now() - timedelta(days=40))
+        User.objects.filter(id=self.users[3].id).update(
+            is_deleted=True, deleted_at=timezone.now() - timedelta(days=1))
+        self.old_ids = [user.id for user in self.users[:3]]
+
+    def test_purge_to_archive_table(self):
+        """
+        Test if the rows past the retention are archived and deleted
+        """
+        job = PurgeJob(get_user_model(), timedelta(days=30), chunk_size=2)
+        job.run()
+
+        self.assertEqual(job.purged, 3)
+        self.assertEqual(
+            sorted(get_user_model()._base_manager.values_list(
+                'id', flat=True)),
+            [user.id for user in self.users[3:]])
+        archived = ArchivedRow.objects.order_by('row_id')
+        self.assertEqual([row.row_id for row in archived], self.old_ids)
+        self.assertEqual(archived[0].model, 'core.user')
+        self.assertEqual(archived[0].data['email'], 'user0@test.com')
+
+    def test_purge_to_file(self):
+        """
+        Test if the rows are appended to a gzipped JSONL file
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'users.jsonl.gz')
+            PurgeJob(get_user_model(), timedelta(days=30),
+                     chunk_size=2, output=output).run()
+            with gzip.open(output, 'rt') as lines:
+                rows = [json.loads(line) for line in lines]
+
+        self.assertEqual([row['data']['id'] for row in rows], self.old_ids)
+        self.assertFalse(ArchivedRow.objects.exists())
+        self.assertFalse(get_user_model()._base_manager.filter(
+            id__in=self.old_ids).exists())
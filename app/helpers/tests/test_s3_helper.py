@@ -0,0 +1,89 @@
+import hashlib
+import os
+import tempfile
+
+from botocore.stub import ANY, Stubber
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from helpers import s3_helper
+
+
+class S3HelperTest(SimpleTestCase):
+    """
+    Tests the s3 helpers against a stubbed client
+    """
+
+    def setUp(self):
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            UPLOAD_SPOOL_DIR=self.spool_dir.name,
+            AWS_S3_CONTENT_ADDRESSED_FOLDERS=['profile'])
+        self.settings.enable()
+        self.stubber = Stubber(s3_helper.get_s3_client())
+        self.stubber.activate()
+
+    def tearDown(self):
+        self.stubber.deactivate()
+        self.settings.disable()
+        self.spool_dir.cleanup()
+
+    def test_stage_upload_content_addressed(self):
+        """
+        Test if identical files get the same path from their digest
+        """
+        paths = []
+        for name in ('a.PNG', 'b.png'):
+            spool_path, s3_upload_path = s3_helper.stage_upload(
+                SimpleUploadedFile(name, b'image'), 'profile')
+            with open(spool_path, 'rb') as spool_file:
+                self.assertEqual(spool_file.read(), b'image')
+            paths.append(s3_upload_path)
+
+        self.assertEqual(paths, [
+            'profile/' + hashlib.sha256(b'image').hexdigest() + '.png'] * 2)
+
+    def test_stage_upload_random_path(self):
+        """
+        Test if files of other folders get a unique path
+        """
+        _, first_path = s3_helper.stage_upload(
+            SimpleUploadedFile('a.png', b'image'), 'general')
+        _, second_path = s3_helper.stage_upload(
+            SimpleUploadedFile('a.png', b'image'), 'general')
+
+        self.assertTrue(first_path.startswith('general/'))
+        self.assertNotEqual(first_path, second_path)
+
+    def test_upload_file_skips_existing_content(self):
+        """
+        Test if a content addressed file already on s3
+        is not uploaded again
+        """
+        spool_path, s3_upload_path = s3_helper.stage_upload(
+            SimpleUploadedFile('a.png', b'image'), 'profile')
+        self.stubber.add_response(
+            'head_object', {'ContentLength': 5, 'ContentType': 'image/png'},
+            {'Bucket': ANY, 'Key': s3_upload_path})
+
+        self.assertFalse(s3_helper.upload_file_to_aws(
+            spool_path, s3_upload_path, content_addressed=True))
+        self.stubber.assert_no_pending_responses()
+
+    def test_upload_file_new_content(self):
+        """
+        Test if new content is uploaded with immutable cache headers
+        """
+        spool_path, s3_upload_path = s3_helper.stage_upload(
+            SimpleUploadedFile('a.png', b'image'), 'profile')
+        self.stubber.add_client_error(
+            'head_object', service_error_code='404', http_status_code=404)
+        self.stubber.add_response('put_object', {}, {
+            'Bucket': ANY, 'Key': s3_upload_path, 'Body': ANY,
+            'ContentType': 'image/png',
+            'CacheControl': 'public, max-age=31536000, immutable'})
+
+        self.assertTrue(s3_helper.upload_file_to_aws(
+            spool_path, s3_upload_path, content_addressed=True))
+        self.stubber.assert_no_pending_responses()
+        self.assertTrue(os.path.exists(spool_path))
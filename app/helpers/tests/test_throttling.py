@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.parsers import JSONParser
+from rest_framework.test import APIRequestFactory
+
+from helpers.throttling import GCRAThrottle
+
+
+class View:
+    throttle_scope = 'test'
+
+
+@mock.patch.object(GCRAThrottle, 'THROTTLE_RATES', {'test': '3/min'})
+class GCRAThrottleTest(SimpleTestCase):
+    """
+    Tests the redis backed GCRA throttle
+    """
+
+    def tearDown(self):
+        cache.delete_pattern('throttle:gcra:test:*')
+
+    def get_request(self, ip='10.0.0.1', **data):
+        request = APIRequestFactory().post(
+            '/', data, format='json', REMOTE_ADDR=ip)
+
+        return Request(request, parsers=[JSONParser()])
+
+    def allow(self, request):
+        throttle = GCRAThrottle()
+        allowed = throttle.allow_request(request, View())
+
+        return allowed, throttle.wait()
+
+    def test_throttles_after_rate(self):
+        """
+        Test if the requests beyond the rate are throttled
+        with a wait time
+        """
+        for _ in range(3):
+            self.assertTrue(self.allow(self.get_request())[0])
+
+        allowed, wait = self.allow(self.get_request())
+        self.assertFalse(allowed)
+        self.assertTrue(0 < wait <= 20)
+
+    def test_throttles_on_body_fields(self):
+        """
+        Test if an email is throttled across different IPs
+        """
+        for index in range(3):
+            request = self.get_request(
+                ip='10.0.1.' + str(index), email='test@gmail.com')
+            self.assertTrue(self.allow(request)[0])
+
+        request = self.get_request(ip='10.0.1.9', email='Test@gmail.com')
+        self.assertFalse(self.allow(request)[0])
+        self.assertTrue(self.allow(self.get_request(ip='10.0.1.9'))[0])
+
+    def test_view_without_rate(self):
+        """
+        Test if a scope without a rate is not throttled
+        """
+        View.throttle_scope = 'no_rate'
+        try:
+            for _ in range(5):
+                self.assertTrue(self.allow(self.get_request())[0])
+        finally:
+            View.throttle_scope = 'test'
@@ -0,0 +1,89 @@
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+# GCRA over every key of KEYS, a key holds the theoretical arrival
+# time (TAT) in ms of the next request for one identity.
+# ARGV: now (ms), emission interval (ms), burst tolerance (ms)
+# The request is allowed only if every identity is within its
+# limit, returns {allowed, ms to wait before retrying}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+    if tat - now > tolerance then
+        return {0, math.ceil(tat - now - tolerance)}
+    end
+    tats[i] = tat + interval
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tats[i], 'PX', math.ceil(tats[i] - now))
+end
+return {1, 0}
+"""
+
+
+class GCRAThrottle(SimpleRateThrottle):
+    """
+    Rate limits a view with the generic cell rate algorithm in
+    one atomic redis script, each request costs a constant amount
+    of work whatever the rate. The request is keyed on the client
+    IP and on every field of ident_fields sent in the body, so a
+    number or email can't be attacked from many IPs.
+
+    The rate is taken from DEFAULT_THROTTLE_RATES using the
+    throttle_scope of the view, views without a rate are not
+    throttled.
+    """
+    ident_fields = ('email', 'mobile_number')
+    cache_format = 'throttle:gcra:%(scope)s:%(ident)s'
+    scope_attr = 'throttle_scope'
+    timer = time.time
+
+    def __init__(self):
+        # The rate is only known once the view calls allow_request
+        self.retry_after = None
+
+    def get_idents(self, request):
+        """
+        Returns the identities the request is throttled on
+        """
+        idents = ['ip:' + self.get_ident(request)]
+        for field in self.ident_fields:
+            value = request.data.get(field) if hasattr(
+                request.data, 'get') else None
+            if isinstance(value, str) and value:
+                idents.append(field + ':' + value.strip().lower())
+
+        return idents
+
+    def allow_request(self, request, view):
+        if not getattr(self, 'rate', None):
+            self.scope = getattr(view, self.scope_attr, None)
+            self.rate = self.THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+
+        num_requests, duration = self.parse_rate(self.rate)
+        interval = duration * 1000 / num_requests
+        client = cache.client
+        keys = [
+            client.make_key(self.cache_format % {
+                'scope': self.scope, 'ident': ident})
+            for ident in self.get_idents(request)
+        ]
+
+        script = client.get_client(write=True).register_script(GCRA_SCRIPT)
+        allowed, retry_after = script(keys=keys, args=[
+            int(self.timer() * 1000), interval,
+            duration * 1000 - interval])
+        self.retry_after = retry_after / 1000
+
+        return allowed == 1
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,27 @@
+from rest_framework_simplejwt.settings import api_settings
+
+from helpers.cache_adapter import CacheAdapter
+
+TOKEN_BLACKLIST_PREFIX = 'jwt_blacklist:'
+
+
+def get_remaining_lifetime(token):
+    """
+    Returns the seconds left before the token expires, at least 1
+    """
+    return max(1, int(token['exp'] - token.current_time.timestamp()))
+
+
+def blacklist_token(token):
+    """
+    Blacklists the token by its jti until it expires, returns
+    False if it was already blacklisted
+    """
+    return CacheAdapter().add(
+        TOKEN_BLACKLIST_PREFIX + token[api_settings.JTI_CLAIM], 1,
+        get_remaining_lifetime(token))
+
+
+def is_token_blacklisted(token):
+    return CacheAdapter().get(
+        TOKEN_BLACKLIST_PREFIX + token[api_settings.JTI_CLAIM]) is not None
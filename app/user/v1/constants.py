@@ -1,3 +1,7 @@
 OTP_PREFIX = 'otp_login_'
 OTP_EXPIRY_IN_SECONDS = 180
+OTP_ATTEMPTS_PREFIX = 'otp_attempts_'
+OTP_MAX_ATTEMPTS = 5
 EMAIL_EXPIRY_IN_SECONDS = 600
+BULK_REGISTER_CHUNK_SIZE = 1000
+BULK_CREATE_BATCH_SIZE = 500
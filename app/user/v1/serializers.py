@@ -1,13 +1,29 @@
+import os
+
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.http import Http404
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 
-from .constants import OTP_PREFIX
+from .constants import OTP_PREFIX, OTP_ATTEMPTS_PREFIX, OTP_MAX_ATTEMPTS, \
+    OTP_EXPIRY_IN_SECONDS, BULK_CREATE_BATCH_SIZE
 from helpers.cache_adapter import CacheAdapter
+from helpers.password_helper import make_passwords
+from helpers.token_blacklist import blacklist_token, is_token_blacklisted
 from helpers.validators import is_valid_email, is_strong_password, \
     is_valid_mobile_number
-from helpers.s3_helper import upload_to_aws
+from helpers.misc_helper import get_random_string
+from helpers.outbox import enqueue
+from helpers.s3_helper import stage_upload, create_presigned_post, \
+    get_uploaded_file, is_content_addressed
+from worker.tasks import upload_profile_image, \
+    create_profile_image_variants
 
 
 class RegisterUserSerializer(serializers.Serializer):
@@ -31,29 +47,44 @@ class RegisterUserSerializer(serializers.Serializer):
         except ObjectDoesNotExist:
             return False
 
+    def validate_uniqueness(self, attrs, errors):
+        """
+        Adds errors for the email and mobile number
+        that are already registered
+        """
+        if self.does_user_exist(email=attrs.get('email')):
+            errors['email'] = ["User with this email already exist"]
+
+        if self.does_user_exist(mobile_number=attrs.get('mobile_number')):
+            errors['mobile_number'] = [
+                "User with this mobile number already exist"]
+
+    def raise_conflicts(self, attrs):
+        """
+        Raises the uniqueness errors after the insert hit the unique
+        indexes, the email or mobile number was registered by a
+        concurrent request since it was validated
+        """
+        errors = {}
+        self.validate_uniqueness(attrs, errors)
+        if errors:
+            raise serializers.ValidationError(errors)
+
     def validate(self, attrs):
         """
         Validate the body params
         """
-        email = attrs.get('email')
-        mobile_number = attrs.get('mobile_number')
-
         errors = {}
-        if not is_valid_email(email):
+        if not is_valid_email(attrs.get('email')):
             errors['email'] = ["Not a valid email"]
 
-        if self.does_user_exist(email=email, is_deleted=False):
-            errors['email'] = ["User with this email already exist"]
-
         if not is_strong_password(attrs.get('password')):
             errors['password'] = ["Not a strong password"]
 
         if not is_valid_mobile_number(attrs.get('mobile_number')):
             errors['mobile_number'] = ["Not a valid mobile number"]
 
-        if self.does_user_exist(mobile_number=mobile_number, is_deleted=False):
-            errors['mobile_number'] = [
-                "User with this mobile number already exist"]
+        self.validate_uniqueness(attrs, errors)
 
         if attrs.get('password') != attrs.get('confirm_password'):
             errors['confirm_password'] = ["Passwords do not match."]
@@ -65,52 +96,205 @@ class RegisterUserSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         """
-        Creates the user in core_user table
+        Creates the user in core_user table, the profile image
+        is spooled and uploaded to s3 by the worker
         """
         validated_data.pop('confirm_password')
+        profile_image = validated_data.pop('profile_image', None)
+        if profile_image is None:
+            try:
+                with transaction.atomic():
+                    return get_user_model().objects.create_user(
+                        **validated_data)
+            except IntegrityError:
+                self.raise_conflicts(validated_data)
+                raise
+
+        spool_path, s3_upload_path = stage_upload(profile_image, 'profile')
+        try:
+            with transaction.atomic():
+                User = get_user_model()
+                user = User.objects.create_user(
+                    profile_image_status=User.PROFILE_IMAGE_PENDING,
+                    **validated_data)
+                enqueue(upload_profile_image,
+                        (user.id, spool_path, s3_upload_path,
+                         is_content_addressed('profile')))
+        except Exception as exc:
+            # no task will ever refer to the spooled file
+            os.remove(spool_path)
+            if isinstance(exc, IntegrityError):
+                self.raise_conflicts(validated_data)
+            raise
+
+        return user
+
+
+class BulkRegisterRowSerializer(RegisterUserSerializer):
+    """
+    Validates a single row of a bulk registration, the
+    uniqueness checks are done for the whole batch at once
+    by BulkRegisterUserSerializer
+    """
+
+    def validate_uniqueness(self, attrs, errors):
+        pass
+
+
+class BulkRegisterUserSerializer(serializers.Serializer):
+    users = serializers.ListField(required=True, allow_empty=False)
+
+    def get_duplicate_rows(self, valid_rows, field):
+        """
+        Returns the indexes of the rows whose value for field is
+        already registered or repeated earlier in the batch,
+        uses a single IN query for the whole batch
+        """
+        values = [row[field] for row in valid_rows.values()]
+        existing = set(get_user_model().objects.filter(
+            **{field + '__in': values}
+        ).values_list(field, flat=True))
+
+        duplicates = {}
+        seen = set()
+        for index, row in valid_rows.items():
+            if row[field] in existing:
+                duplicates[index] = "already exist"
+            elif row[field] in seen:
+                duplicates[index] = "is repeated in this batch"
+            seen.add(row[field])
+
+        return duplicates
+
+    def validate(self, attrs):
+        """
+        Validates every row on its own and then checks the
+        whole batch for already registered emails and mobile numbers
+        """
+        model = get_user_model()
+        self.row_errors = {}
+        valid_rows = {}
+        for index, row in enumerate(attrs['users']):
+            row_serializer = BulkRegisterRowSerializer(data=row)
+            if row_serializer.is_valid():
+                data = dict(row_serializer.validated_data)
+                data['email'] = model.objects.normalize_email(data['email'])
+                valid_rows[index] = data
+            else:
+                self.row_errors[index] = row_serializer.errors
+
+        for field, label in (('email', 'email'),
+                             ('mobile_number', 'mobile number')):
+            duplicates = self.get_duplicate_rows(valid_rows, field)
+            for index, reason in duplicates.items():
+                self.row_errors.setdefault(index, {})[field] = [
+                    "User with this " + label + " " + reason]
+
+        attrs['valid_rows'] = {
+            index: row for index, row in valid_rows.items()
+            if index not in self.row_errors
+        }
+
+        return attrs
 
-        if 'profile_image' in validated_data:
-            uploaded_url = upload_to_aws(
-                validated_data['profile_image'], 'profile')
-            if uploaded_url is False:
-                validated_data['profile_image'] = None
+    def create(self, validated_data):
+        """
+        Hashes the passwords in parallel and creates the
+        valid rows in core_user with batched multi-row inserts
+        """
+        model = get_user_model()
+        rows = list(validated_data['valid_rows'].values())
+        passwords = make_passwords(row['password'] for row in rows)
+
+        users = []
+        for row, password in zip(rows, passwords):
+            row.pop('confirm_password')
+            row.pop('profile_image', None)
+            row['password'] = password
+            users.append(model(**row))
+
+        return model.objects.bulk_create(
+            users, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    def fail_valid_rows(self, error):
+        """
+        Marks the rows which passed the validation failed,
+        when the batch could not be created
+        """
+        for index in self.validated_data['valid_rows']:
+            self.row_errors[index] = {'non_field_errors': [error]}
+
+    def get_results(self, offset=0):
+        """
+        Returns the outcome of every row of the batch, offset
+        is added to the row numbers of the batch
+        """
+        results = []
+        for index in range(len(self.validated_data['users'])):
+            if index in self.row_errors:
+                results.append({'row': offset + index, 'status': 'failed',
+                                'errors': self.row_errors[index]})
             else:
-                validated_data['profile_image'] = uploaded_url
+                results.append({'row': offset + index, 'status': 'created'})
 
-        return get_user_model().objects.create_user(**validated_data)
+        return results
 
 
 class EmailLoginSerializer(serializers.Serializer):
     email = serializers.CharField(required=True, max_length=255)
     password = serializers.CharField(required=True, max_length=255)
-    user = serializers.CharField(required=False)
 
     def validate(self, attrs):
         """
-        Validates the email id and password
+        Validates the email id and password, the password is checked
+        on the fetched user instead of going through authenticate()
+        which would fetch the user again
         """
         email = attrs.get('email')
         try:
-            user_object = get_user_model().objects.get(email=email, is_deleted=False)
+            user = get_user_model().objects.get(email=email)
         except ObjectDoesNotExist:
             raise Http404
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=user_object.id,
-            password=attrs.get('password')
-        )
-
-        if not user:
+        if not user.is_active or not user.check_password(
+                attrs.get('password')):
             raise serializers.ValidationError(
                 {'auth_failure':
                     'Unable to authenticate with provided credential'},
                 code='authentication'
             )
 
+        attrs['user'] = user
+
         return attrs
 
 
+class RefreshTokenSerializer(TokenRefreshSerializer):
+
+    def validate(self, attrs):
+        """
+        Provides new tokens for a refresh token, when refresh tokens
+        are rotated the used one is blacklisted in redis until it
+        expires so that it can be used only once
+        """
+        refresh = RefreshToken(attrs['refresh'])
+
+        if api_settings.ROTATE_REFRESH_TOKENS and \
+                api_settings.BLACKLIST_AFTER_ROTATION:
+            if not blacklist_token(refresh):
+                raise TokenError('Token is blacklisted')
+        elif is_token_blacklisted(refresh):
+            raise TokenError('Token is blacklisted')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
 class PasswordResetMailSerializer(serializers.Serializer):
     email = serializers.CharField(required=True, max_length=255)
 
@@ -134,29 +318,30 @@ class OTPLoginSerializer(serializers.Serializer):
     def validate(self, attrs):
         """
         Validates if the OTP is correct for a given
-        mobile number
+        mobile number, a correct OTP is consumed so it can't be
+        replayed and the attempts per number are limited
         """
         mobile_number = attrs.get('mobile_number')
         try:
-            get_user_model().objects.get(mobile_number=mobile_number)
+            user = get_user_model().objects.get(mobile_number=mobile_number)
         except ObjectDoesNotExist:
             raise Http404
 
-        key = OTP_PREFIX + mobile_number
-        param_otp = attrs.get('otp')
         cache_adapter_obj = CacheAdapter()
-        cached_otp_value = cache_adapter_obj.get(key)
-        user = None
-        if param_otp == cached_otp_value:
-            user = get_user_model().objects.get(mobile_number=mobile_number)
-
-        if not user:
+        is_consumed = cache_adapter_obj.consume_if_equal(
+            OTP_PREFIX + mobile_number, attrs.get('otp'),
+            attempts_key=OTP_ATTEMPTS_PREFIX + mobile_number,
+            max_attempts=OTP_MAX_ATTEMPTS,
+            attempts_timeout=OTP_EXPIRY_IN_SECONDS)
+        if not is_consumed:
             raise serializers.ValidationError(
                 {'auth_failure':
                     'Unable to authenticate with provided credential'},
                 code='authentication'
             )
 
+        attrs['user'] = user
+
         return attrs
 
 
@@ -175,3 +360,81 @@ class OTPGenerateSerializer(serializers.Serializer):
             raise Http404
 
         return attrs
+
+
+def get_profile_image_folder(user):
+    """
+    Returns the s3 folder the user's profile images are uploaded to
+    """
+    return getattr(settings, 'AWS_BUCKET_FOLDERS')['profile'] + \
+        str(user.uuid) + '/'
+
+
+class ProfileImageUploadSerializer(serializers.Serializer):
+    content_type = serializers.CharField(required=True, max_length=255)
+
+    def validate_content_type(self, value):
+        """
+        Allows only the configured image types
+        """
+        config = getattr(settings, 'PROFILE_IMAGE_UPLOAD')
+        if value not in config['CONTENT_TYPES']:
+            raise serializers.ValidationError("Not a supported image type")
+
+        return value
+
+    def get_presigned_post(self, user):
+        """
+        Returns the url and form fields to upload the image
+        directly to s3 under the user's profile folder
+        """
+        config = getattr(settings, 'PROFILE_IMAGE_UPLOAD')
+        content_type = self.validated_data['content_type']
+        key = get_profile_image_folder(user) + get_random_string(20) + \
+            '.' + content_type.split('/')[-1]
+        presigned_post = create_presigned_post(
+            key, content_type, config['MAX_SIZE'], config['EXPIRES_IN'])
+        presigned_post['key'] = key
+
+        return presigned_post
+
+
+class ProfileImageConfirmSerializer(serializers.Serializer):
+    key = serializers.CharField(required=True, max_length=1000)
+
+    def validate_key(self, value):
+        """
+        Checks that the image was uploaded by this user to s3
+        and still satisfies the upload conditions
+        """
+        config = getattr(settings, 'PROFILE_IMAGE_UPLOAD')
+        if not value.startswith(
+                get_profile_image_folder(self.context['user'])):
+            raise serializers.ValidationError("Not a valid key")
+
+        uploaded_file = get_uploaded_file(value)
+        if uploaded_file is None:
+            raise serializers.ValidationError("Image has not been uploaded")
+
+        if uploaded_file['size'] > config['MAX_SIZE'] or \
+                uploaded_file['content_type'] not in config['CONTENT_TYPES']:
+            raise serializers.ValidationError("Not a valid image")
+
+        return value
+
+    def create(self, validated_data):
+        """
+        Sets the uploaded image as the user's profile image,
+        its thumbnails are made by the worker
+        """
+        user = self.context['user']
+        user.profile_image = validated_data['key']
+        user.profile_image_status = user.PROFILE_IMAGE_UPLOADED
+        user.profile_image_variants = None
+        with transaction.atomic():
+            user.save(update_fields=['profile_image', 'profile_image_status',
+                                     'profile_image_variants'])
+            enqueue(create_profile_image_variants,
+                    (user.id, user.profile_image))
+
+        return user
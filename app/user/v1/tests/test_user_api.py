@@ -1,17 +1,38 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+from botocore.stub import Stubber
+from PIL import Image
+from django.core import mail
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
+from core.models import OutboxMessage
 from helpers.cache_adapter import CacheAdapter
-from user.v1.constants import OTP_PREFIX
+from helpers.outbox import relay_messages
+from helpers.s3_helper import get_s3_client
+from user.v1.constants import OTP_PREFIX, OTP_ATTEMPTS_PREFIX, \
+    OTP_MAX_ATTEMPTS
+from user.v1.serializers import BulkRegisterUserSerializer
 
 
 REGISTER_URL = reverse('user:register-user')
+BULK_REGISTER_URL = reverse('user:bulk-register-user')
 LOGIN_URL = reverse('user:login-user')
 GENERATE_OTP_URL = reverse('user:generate-otp')
 REFRESH_TOKEN_URL = reverse('user:refresh-token')
+PROFILE_IMAGE_UPLOAD_URL = reverse('user:profile-image-upload')
+PROFILE_IMAGE_CONFIRM_URL = reverse('user:profile-image-confirm')
 
 
 def create_user(**params):
@@ -27,6 +48,26 @@ def create_default_user():
     )
 
 
+def get_bulk_row(index, **params):
+    row = {
+        "email": "test" + str(index) + "@gmail.com",
+        "password": "TestPassword$87",
+        "confirm_password": "TestPassword$87",
+        "name": "Test User",
+        "mobile_number": str(1234567000 + index)
+    }
+    row.update(params)
+
+    return row
+
+
+def get_image_file(name="avatar.png", size=(300, 200)):
+    data = io.BytesIO()
+    Image.new('RGB', size, 'red').save(data, 'PNG')
+
+    return SimpleUploadedFile(name, data.getvalue(), content_type="image/png")
+
+
 def set_otp(mobile_number='1234567890', otp='123456'):
     obj = CacheAdapter()
     obj.set(OTP_PREFIX + mobile_number, otp, 120)
@@ -45,6 +86,10 @@ class PublicUserAPITest(TestCase):
     def setup(self):
         self.client = APIClient()
 
+    def tearDown(self):
+        CacheAdapter().delete_many([OTP_PREFIX + '1234567890',
+                                    OTP_ATTEMPTS_PREFIX + '1234567890'])
+
     def test_register_user_success(self):
         """
         Tests if the user has been created correctly
@@ -64,6 +109,104 @@ class PublicUserAPITest(TestCase):
             email="test@gmail.com"
         ).exists()
         self.assertTrue(does_user_exist)
+        # the welcome email waits in the outbox for the relay
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(relay_messages(), 1)
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["test@gmail.com"])
+        self.assertIn("Test User", mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+
+    def test_register_user_with_profile_image(self):
+        """
+        Tests if the profile image is spooled and uploaded to
+        s3 with its thumbnails by the worker after the user is created
+        """
+        payload = {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87",
+            "confirm_password": "TestPassword$87",
+            "name": "Test User",
+            "mobile_number": "1234567890",
+            "profile_image": get_image_file()
+        }
+
+        with tempfile.TemporaryDirectory() as spool_dir, \
+                override_settings(UPLOAD_SPOOL_DIR=spool_dir,
+                                  IMAGE_PROCESSING_WORKERS=0), \
+                mock.patch('worker.tasks.upload_file_to_aws') as upload, \
+                mock.patch('helpers.image_helper.upload_bytes_to_aws'):
+            res = self.client.post(REGISTER_URL, payload)
+            relay_messages()
+            self.assertEqual(os.listdir(spool_dir), [])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email="test@gmail.com")
+        spool_path, s3_upload_path, content_addressed = upload.call_args[0]
+        self.assertTrue(content_addressed)
+        self.assertEqual(user.profile_image, s3_upload_path)
+        payload['profile_image'].seek(0)
+        self.assertEqual(s3_upload_path, 'profile/' + hashlib.sha256(
+            payload['profile_image'].read()).hexdigest() + '.png')
+        self.assertEqual(user.profile_image_status,
+                         get_user_model().PROFILE_IMAGE_UPLOADED)
+        self.assertEqual(
+            user.profile_image_variants['256.webp'],
+            os.path.splitext(s3_upload_path)[0] + '/256.webp')
+
+    def test_register_user_concurrent_duplicate(self):
+        """
+        Tests if we get 400 when the email is registered by a
+        concurrent request after it was validated
+        """
+        create_user(email="test@gmail.com", mobile_number="1234567899",
+                    name="Other User", password="TestPassword$87")
+        payload = {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87",
+            "confirm_password": "TestPassword$87",
+            "name": "Test User",
+            "mobile_number": "1234567890"
+        }
+
+        # the first two lookups are those of the validation
+        with mock.patch(
+                'user.v1.serializers.RegisterUserSerializer.does_user_exist',
+                side_effect=[False, False, True, False]):
+            res = self.client.post(REGISTER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['email'],
+                         ["User with this email already exist"])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_register_user_failed_removes_spooled_image(self):
+        """
+        Tests if the spooled profile image is removed when the
+        user can not be created
+        """
+        create_user(email="test@gmail.com", mobile_number="1234567899",
+                    name="Other User", password="TestPassword$87")
+        payload = {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87",
+            "confirm_password": "TestPassword$87",
+            "name": "Test User",
+            "mobile_number": "1234567890",
+            "profile_image": get_image_file()
+        }
+
+        with tempfile.TemporaryDirectory() as spool_dir, \
+                override_settings(UPLOAD_SPOOL_DIR=spool_dir), \
+                mock.patch('user.v1.serializers.RegisterUserSerializer'
+                           '.does_user_exist',
+                           side_effect=[False, False, True, False]):
+            res = self.client.post(REGISTER_URL, payload)
+            self.assertEqual(os.listdir(spool_dir), [])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxMessage.objects.exists())
 
     def test_register_user_empty_payload(self):
         """
@@ -157,6 +300,100 @@ class PublicUserAPITest(TestCase):
         self.assertIn('access', res.data)
         self.assertIn('refresh', res.data)
 
+    def test_login_user_using_password_single_query(self):
+        """
+        Test if the email/password login fetches the user
+        with a single query
+        """
+        create_default_user()
+
+        payload = {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87"
+        }
+
+        with self.assertNumQueries(1):
+            res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_user_upgrades_password_hash(self):
+        """
+        Test if a password hashed with an older hasher is
+        rehashed with the preferred one on login
+        """
+        user = create_default_user()
+        user.password = make_password("TestPassword$87", hasher='pbkdf2_sha1')
+        user.save()
+
+        payload = {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87"
+        }
+
+        res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2'))
+        self.assertTrue(user.check_password("TestPassword$87"))
+
+    def test_login_user_using_otp_single_query(self):
+        """
+        Test if the mobile_number/otp login fetches the user
+        with a single query
+        """
+        create_default_user()
+        set_otp()
+
+        payload = {
+            "mobile_number": "1234567890",
+            "otp": "123456"
+        }
+
+        with self.assertNumQueries(1):
+            res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_user_otp_not_reusable(self):
+        """
+        Test if an OTP can't be used again after a
+        successful login
+        """
+        create_default_user()
+        set_otp()
+
+        payload = {
+            "mobile_number": "1234567890",
+            "otp": "123456"
+        }
+
+        res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_otp())
+
+        res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_user_otp_attempts_limited(self):
+        """
+        Test if the correct OTP is rejected after too
+        many wrong attempts
+        """
+        create_default_user()
+        set_otp()
+
+        for _ in range(OTP_MAX_ATTEMPTS):
+            self.client.post(LOGIN_URL, {
+                "mobile_number": "1234567890",
+                "otp": "000000"
+            })
+
+        res = self.client.post(LOGIN_URL, {
+            "mobile_number": "1234567890",
+            "otp": "123456"
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_otp(), "123456")
+
     def test_login_user_empty_payload(self):
         """
         Test if we get 400 on empty payload
@@ -302,3 +539,314 @@ class PublicUserAPITest(TestCase):
         self.assertEqual(refersh_res.status_code, status.HTTP_200_OK)
         self.assertIn('access', refersh_res.data)
         self.assertIn('refresh', refersh_res.data)
+
+    def test_refresh_token_single_use(self):
+        """
+        Test if a rotated refresh token can't be used again
+        """
+        create_default_user()
+
+        login_res = self.client.post(LOGIN_URL, {
+            "email": "test@gmail.com",
+            "password": "TestPassword$87"
+        })
+        refresh_payload = {'refresh': login_res.data['refresh']}
+
+        res = self.client.post(REFRESH_TOKEN_URL, refresh_payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(REFRESH_TOKEN_URL, refresh_payload)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BulkRegisterUserAPITest(TestCase):
+    """
+    Tests the bulk register API, which needs the access
+    token of an admin user
+    """
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "TestPassword$87")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(
+            AccessToken.for_user(self.admin)))
+
+    def test_bulk_register_user_success(self):
+        """
+        Tests if all the users of a batch are created
+        using the bulk register API
+        """
+        payload = [get_bulk_row(index) for index in range(5)]
+
+        res = self.client.post(
+            BULK_REGISTER_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 5)
+        self.assertEqual(res.data['failed'], 0)
+        self.assertEqual(get_user_model().objects.filter(
+            email__endswith="@gmail.com").count(), 5)
+        user = get_user_model().objects.get(email="test3@gmail.com")
+        self.assertTrue(user.check_password("TestPassword$87"))
+
+    def test_bulk_register_user_emails_per_chunk(self):
+        """
+        Tests if the welcome emails of each chunk are written
+        to the outbox with the chunk
+        """
+        payload = [get_bulk_row(index) for index in range(5)]
+
+        with mock.patch('user.v1.views.BULK_REGISTER_CHUNK_SIZE', 2):
+            res = self.client.post(
+                BULK_REGISTER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [len(message.args[0]) for message in
+             OutboxMessage.objects.order_by('id')], [2, 2, 1])
+
+    def test_bulk_register_user_duplicates(self):
+        """
+        Tests if rows with registered or repeated emails and
+        mobile numbers fail without failing the batch
+        """
+        create_default_user()
+        payload = {'users': [
+            get_bulk_row(0),
+            get_bulk_row(1, email="test@gmail.com"),
+            get_bulk_row(2, mobile_number="1234567000"),
+            get_bulk_row(3, email="invalid"),
+        ]}
+
+        res = self.client.post(
+            BULK_REGISTER_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        statuses = [result['status'] for result in res.data['results']]
+        self.assertEqual(
+            statuses, ['created', 'failed', 'failed', 'failed'])
+        self.assertIn('email', res.data['results'][1]['errors'])
+        self.assertIn('mobile_number', res.data['results'][2]['errors'])
+        self.assertIn('email', res.data['results'][3]['errors'])
+
+    def test_bulk_register_user_concurrent_duplicate(self):
+        """
+        Tests if a chunk whose insert hits a concurrently registered
+        email is validated again without losing the other chunks
+        """
+        payload = [get_bulk_row(index) for index in range(4)]
+        validate = BulkRegisterUserSerializer.validate
+
+        def register_concurrently(serializer, attrs):
+            attrs = validate(serializer, attrs)
+            # test2 is registered between the validation and the insert
+            emails = [row['email'] for row in attrs['users']]
+            users = get_user_model().objects.filter(email="test2@gmail.com")
+            if "test2@gmail.com" in emails and not users.exists():
+                create_user(email="test2@gmail.com",
+                            mobile_number="1234567899",
+                            password="TestPassword$87")
+            return attrs
+
+        with mock.patch('user.v1.views.BULK_REGISTER_CHUNK_SIZE', 2), \
+                mock.patch.object(BulkRegisterUserSerializer, 'validate',
+                                  autospec=True,
+                                  side_effect=register_concurrently):
+            res = self.client.post(
+                BULK_REGISTER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            ['created', 'created', 'failed', 'created'])
+        self.assertIn('email', res.data['results'][2]['errors'])
+
+    def test_bulk_register_user_chunk_conflict(self):
+        """
+        Tests if the rows of a chunk which keeps hitting the
+        unique indexes are failed and the other results returned
+        """
+        payload = [get_bulk_row(index) for index in range(4)]
+        save = BulkRegisterUserSerializer.save
+
+        def save_second_chunk(serializer):
+            if serializer.validated_data['users'][0]['email'] == \
+                    "test2@gmail.com":
+                raise IntegrityError
+            return save(serializer)
+
+        with mock.patch('user.v1.views.BULK_REGISTER_CHUNK_SIZE', 2), \
+                mock.patch.object(BulkRegisterUserSerializer, 'save',
+                                  autospec=True,
+                                  side_effect=save_second_chunk):
+            res = self.client.post(
+                BULK_REGISTER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            ['created', 'created', 'failed', 'failed'])
+
+    def test_bulk_register_user_csv(self):
+        """
+        Tests if the users are created from an uploaded CSV file
+        """
+        fields = ["email", "password", "confirm_password", "name",
+                  "mobile_number"]
+        lines = [",".join(fields)] + [
+            ",".join(get_bulk_row(index)[field] for field in fields)
+            for index in range(3)
+        ]
+        csv_file = SimpleUploadedFile(
+            "users.csv", "\n".join(lines).encode(), content_type="text/csv")
+
+        res = self.client.post(BULK_REGISTER_URL, {'file': csv_file})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 3)
+
+    def test_bulk_register_user_empty_payload(self):
+        """
+        Tests if the bulk API returns error with no rows
+        """
+        res = self.client.post(
+            BULK_REGISTER_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_register_user_invalid_payload(self):
+        """
+        Tests if the bulk API returns error for a body which
+        is neither a list nor an object
+        """
+        res = self.client.post(
+            BULK_REGISTER_URL, '"abc"', content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_register_user_unauthenticated(self):
+        """
+        Tests if an access token is needed
+        """
+        self.client.credentials()
+        res = self.client.post(
+            BULK_REGISTER_URL, [get_bulk_row(0)], format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_register_user_not_admin(self):
+        """
+        Tests if only admin users can register users in bulk
+        """
+        user = create_default_user()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(
+            AccessToken.for_user(user)))
+        res = self.client.post(
+            BULK_REGISTER_URL, [get_bulk_row(0)], format='json')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(get_user_model().objects.filter(
+            email="test0@gmail.com").exists())
+
+
+class PrivateUserAPITest(TestCase):
+    """
+    Test the user APIs which need an access token, s3 is
+    replaced by a stubbed client
+    """
+
+    def setUp(self):
+        self.user = create_default_user()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(
+            AccessToken.for_user(self.user)))
+        self.stubber = Stubber(get_s3_client())
+        self.stubber.activate()
+
+    def tearDown(self):
+        self.stubber.deactivate()
+
+    def get_uploaded_key(self):
+        res = self.client.post(
+            PROFILE_IMAGE_UPLOAD_URL, {'content_type': 'image/png'})
+
+        return res.data['key']
+
+    def test_profile_image_upload_success(self):
+        """
+        Test if a presigned POST is returned for the
+        user's profile folder
+        """
+        res = self.client.post(
+            PROFILE_IMAGE_UPLOAD_URL, {'content_type': 'image/png'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['key'].startswith(
+            'profile/' + str(self.user.uuid) + '/'))
+        self.assertTrue(res.data['key'].endswith('.png'))
+        self.assertEqual(res.data['fields']['key'], res.data['key'])
+        self.assertEqual(res.data['fields']['Content-Type'], 'image/png')
+        self.assertIn('policy', res.data['fields'])
+
+    def test_profile_image_upload_wrong_content_type(self):
+        """
+        Test if only images can be uploaded
+        """
+        res = self.client.post(
+            PROFILE_IMAGE_UPLOAD_URL, {'content_type': 'text/html'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_profile_image_upload_unauthenticated(self):
+        """
+        Test if an access token is needed
+        """
+        self.client.credentials()
+        res = self.client.post(
+            PROFILE_IMAGE_UPLOAD_URL, {'content_type': 'image/png'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_image_confirm_success(self):
+        """
+        Test if the uploaded image is set on the user
+        """
+        key = self.get_uploaded_key()
+        self.stubber.add_response(
+            'head_object',
+            {'ContentLength': 1024, 'ContentType': 'image/png'},
+            {'Bucket': 'AWS_BUCKET', 'Key': key})
+
+        res = self.client.post(PROFILE_IMAGE_CONFIRM_URL, {'key': key})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'create_profile_image_variants')
+        self.assertEqual(message.args, [self.user.id, key])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_image, key)
+        self.assertEqual(self.user.profile_image_status,
+                         get_user_model().PROFILE_IMAGE_UPLOADED)
+        self.stubber.assert_no_pending_responses()
+
+    def test_profile_image_confirm_not_uploaded(self):
+        """
+        Test if a key which was never uploaded is rejected
+        """
+        key = self.get_uploaded_key()
+        self.stubber.add_client_error(
+            'head_object', service_error_code='404', http_status_code=404)
+
+        res = self.client.post(PROFILE_IMAGE_CONFIRM_URL, {'key': key})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.profile_image)
+
+    def test_profile_image_confirm_other_user_key(self):
+        """
+        Test if a key outside the user's folder is rejected
+        without calling s3
+        """
+        res = self.client.post(PROFILE_IMAGE_CONFIRM_URL, {
+            'key': 'profile/someone-else/avatar.png'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
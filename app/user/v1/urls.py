@@ -1,16 +1,22 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
 
 from .views import RegisterUserView, LoginUserView, GenerateOTPView, \
-    PasswordResetMailView, PasswordResetView
+    PasswordResetMailView, PasswordResetView, BulkRegisterUserView, \
+    RefreshTokenView, ProfileImageUploadView, ProfileImageConfirmView
 
 app_name = 'user'
 
 urlpatterns = [
     path('register/', RegisterUserView.as_view(), name='register-user'),
+    path('register/bulk/', BulkRegisterUserView.as_view(),
+         name='bulk-register-user'),
     path('login/', LoginUserView.as_view(), name='login-user'),
     path('generate/otp/', GenerateOTPView.as_view(), name='generate-otp'),
-    path('refresh/token/', TokenRefreshView.as_view(), name='refresh-token'),
+    path('refresh/token/', RefreshTokenView.as_view(), name='refresh-token'),
+    path('profile_image/upload/', ProfileImageUploadView.as_view(),
+         name='profile-image-upload'),
+    path('profile_image/confirm/', ProfileImageConfirmView.as_view(),
+         name='profile-image-confirm'),
     path('password_reset/mail/', PasswordResetMailView.as_view(),
          name='password-reset-mail'),
     path('password_reset/<str:uid>/',
@@ -1,3 +1,8 @@
+import codecs
+import csv
+from itertools import islice
+
+from django.db import IntegrityError, transaction
 from django.views import View
 from django.contrib.auth import get_user_model
 from django.template import RequestContext
@@ -5,18 +10,26 @@ from django.urls import reverse
 from django.contrib import messages
 from django.shortcuts import render, render_to_response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework.throttling import UserRateThrottle
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from worker.tasks import send_welcome_email, send_reset_password_email
-from .constants import OTP_PREFIX, OTP_EXPIRY_IN_SECONDS, EMAIL_EXPIRY_IN_SECONDS
+from worker.tasks import send_reset_password_email, \
+    send_bulk_welcome_email, send_welcome_email
+from .constants import OTP_PREFIX, OTP_EXPIRY_IN_SECONDS, \
+    EMAIL_EXPIRY_IN_SECONDS, BULK_REGISTER_CHUNK_SIZE
+from helpers.authentication import CachedJWTAuthentication
 from helpers.cache_adapter import CacheAdapter
+from helpers.outbox import enqueue
+from helpers.throttling import GCRAThrottle
 from helpers.misc_helper import get_random_number, get_random_string, \
     get_domain_url
 from .serializers import RegisterUserSerializer, EmailLoginSerializer, \
-    OTPLoginSerializer, OTPGenerateSerializer, PasswordResetMailSerializer
+    OTPLoginSerializer, OTPGenerateSerializer, PasswordResetMailSerializer, \
+    BulkRegisterUserSerializer, RefreshTokenSerializer, \
+    ProfileImageUploadSerializer, ProfileImageConfirmSerializer
 from .forms import PasswordResetForm
 
 
@@ -24,17 +37,21 @@ class RegisterUserView(APIView):
     """
     Creates a user in the DB
     """
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'register'
 
     def post(self, request):
         """
         POST API -> /api/v1/user/register
-        Validates and creates a User in core_user table
+        Validates and creates a User in core_user table, the
+        welcome email is written to the outbox with the user
         """
         serializer = RegisterUserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            send_welcome_email.delay(
-                request.data['email'], request.data['name'])
+            with transaction.atomic():
+                serializer.save()
+                enqueue(send_welcome_email,
+                        (request.data['email'], request.data['name']))
 
             return Response({'response': 'User Created!'},
                             status=status.HTTP_201_CREATED)
@@ -42,28 +59,109 @@ class RegisterUserView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class LoginUserView(APIView):
+class BulkRegisterUserView(APIView):
     """
-    Authenticates a user
+    Creates users in bulk from a JSON list or a CSV file,
+    for admin users only
     """
-    throttle_classes = [UserRateThrottle]
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'bulk_register'
 
-    def get_user(self, data):
+    def get_rows(self, request):
         """
-        Returns a User given email/mobile_number
+        Returns an iterator over the rows to be registered, read
+        lazily from an uploaded CSV file or taken from the JSON body,
+        returns None if the payload has no rows
         """
-        if "email" in data:
-            return get_user_model().objects.get(email=data['email'], is_deleted=False)
-        else:
-            return get_user_model().objects.get(
-                mobile_number=data['mobile_number'], is_deleted=False)
+        if 'file' in request.FILES:
+            return csv.DictReader(
+                codecs.iterdecode(request.FILES['file'], 'utf-8-sig'))
+
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('users')
+        if not isinstance(rows, list) or not rows:
+            return None
+
+        return iter(rows)
+
+    def save_chunk(self, chunk):
+        """
+        Validates and creates the users of a chunk with their welcome
+        emails, returns the serializer and the number of users created.
+        A chunk whose insert hits the unique indexes (a user registered
+        concurrently) is validated and saved once more, then its rows
+        are marked failed
+        """
+        for _ in range(2):
+            serializer = BulkRegisterUserSerializer(data={'users': chunk})
+            serializer.is_valid(raise_exception=True)
+            try:
+                # the welcome emails of a chunk are committed with its users
+                with transaction.atomic():
+                    users = serializer.save()
+                    recipients = [(user.email, user.name) for user in users]
+                    if recipients:
+                        enqueue(send_bulk_welcome_email, (recipients,))
+            except IntegrityError:
+                continue
+
+            return serializer, len(recipients)
+
+        serializer.fail_valid_rows(
+            "User with this email or mobile number already exist")
+
+        return serializer, 0
+
+    def post(self, request):
+        """
+        POST API -> /api/v1/user/register/bulk
+        Validates and creates the users chunk by chunk and
+        returns the result for every row
+        """
+        rows = self.get_rows(request)
+        if rows is None:
+            return Response({'detail': 'invalid params'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        created = 0
+        while True:
+            chunk = list(islice(rows, BULK_REGISTER_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            serializer, chunk_created = self.save_chunk(chunk)
+            created += chunk_created
+            results.extend(serializer.get_results(offset=len(results)))
+
+        if not results:
+            return Response({'detail': 'invalid params'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
+class LoginUserView(APIView):
+    """
+    Authenticates a user
+    """
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'login'
 
     def get_token(self, serializer):
         """
-        Returns access and refersh token for a user
+        Returns access and refersh token for a user, the user
+        is the one already fetched by the serializer
         """
         if serializer.is_valid():
-            user = self.get_user(serializer.data)
+            user = serializer.validated_data['user']
             refresh = TokenObtainPairSerializer.get_token(user)
 
             return Response({
@@ -90,10 +188,21 @@ class LoginUserView(APIView):
         return self.get_token(serializer)
 
 
+class RefreshTokenView(TokenRefreshView):
+    """
+    Provides new access and refresh tokens for a refresh token
+    """
+    serializer_class = RefreshTokenSerializer
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'refresh_token'
+
+
 class GenerateOTPView(APIView):
     """
     Generates OTP for user
     """
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'otp'
 
     def post(self, request):
         """
@@ -149,6 +258,8 @@ class PasswordResetMailView(APIView):
     """
     Sends an email with a link to reset the password for the user
     """
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         """
@@ -166,9 +277,56 @@ class PasswordResetMailView(APIView):
             link = get_domain_url(
                 request) + reverse('user:password-reset', args=(random_string,))
             print(link)
-            send_reset_password_email.delay(email, link)
+            enqueue(send_reset_password_email, (email, link))
 
             return Response({'response': 'Reset email sent!'},
                             status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProfileImageUploadView(APIView):
+    """
+    Returns a presigned POST to upload the profile image
+    directly to s3
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'profile_image'
+
+    def post(self, request):
+        """
+        POST API -> /api/v1/user/profile_image/upload
+        """
+        serializer = ProfileImageUploadSerializer(data=request.data)
+        if serializer.is_valid():
+            return Response(serializer.get_presigned_post(request.user),
+                            status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProfileImageConfirmView(APIView):
+    """
+    Sets an image uploaded with a presigned POST as the
+    profile image of the user
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [GCRAThrottle]
+    throttle_scope = 'profile_image'
+
+    def post(self, request):
+        """
+        POST API -> /api/v1/user/profile_image/confirm
+        """
+        serializer = ProfileImageConfirmSerializer(
+            data=request.data, context={'user': request.user})
+        if serializer.is_valid():
+            user = serializer.save()
+
+            return Response({'profile_image': user.profile_image},
+                            status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
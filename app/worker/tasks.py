@@ -1,39 +1,279 @@
-from django.core.mail import send_mail
+import os
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from celery.decorators import task
 from celery.utils.log import get_task_logger
 
+from helpers.batch_job import get_job
+from helpers.cache_adapter import CacheAdapter
+from helpers.cron_helper import cron, OVERLAP_COALESCE
+from helpers.email_helper import send_messages
+from helpers.email_templates import render_email
+from helpers.image_helper import make_variants, upload_variants
+from helpers.s3_helper import upload_file_to_aws, download_from_aws, \
+    get_spool_path
+
 logger = get_task_logger(__name__)
 
+EMAIL_QUEUE_KEY = 'email:queue'
+EMAIL_PROCESSING_KEY = 'email:processing'
+EMAIL_DEAD_LETTER_KEY = 'email:dead_letter'
+EMAIL_DRAIN_SCHEDULED_KEY = 'email:drain_scheduled'
+EMAIL_FROM = 'sajal.4591@gmail.com'
+
+
+def get_welcome_email(email, name):
+    return render_email('user/emails/welcome', "Welcome!", {'name': name},
+                        EMAIL_FROM, [email])
+
+
+def queue_email(template_name, subject, context, to):
+    """
+    Adds an email to the email queue, it is rendered and sent in
+    a batch by send_queued_emails which is scheduled to run
+    EMAIL_BATCH_DELAY seconds after the first queued email
+    """
+    cache_adapter = CacheAdapter()
+    cache_adapter.push_many(EMAIL_QUEUE_KEY, [{
+        'template_name': template_name,
+        'subject': subject,
+        'context': context,
+        'from_email': EMAIL_FROM,
+        'to': to,
+    }])
+    delay = getattr(settings, 'EMAIL_BATCH_DELAY', 5)
+    if cache_adapter.add(EMAIL_DRAIN_SCHEDULED_KEY, 1, delay + 60):
+        send_queued_emails.apply_async(countdown=delay)
+
 
 @task(name="send_welcome_email")
 def send_welcome_email(email, name):
     """
-    sends email to the client
+    queues the welcome email of the client, it is sent
+    with the next batch of queued emails
     """
-    logger.info("sending email to - " + email)
+    logger.info("queueing email to - " + email)
+
+    queue_email('user/emails/welcome', "Welcome!", {'name': name}, [email])
+
 
-    return send_mail(
-        "Welcome!",
-        "Welcome to our side " + name,
-        'sajal.4591@gmail.com',
-        [email],
-        fail_silently=False
-    )
+def get_email_retry_countdown(retries):
+    return getattr(settings, 'EMAIL_BATCH_DELAY', 5) * 2 ** retries
 
 
-@task(name="send_reset_password_email")
-def send_reset_password_email(email, link):
+@task(name="send_bulk_welcome_email", bind=True, max_retries=5)
+def send_bulk_welcome_email(self, recipients):
     """
-    sends email to the client
+    sends the welcome email to a list of (email, name)
+    pairs over a single connection, after a failure the
+    task is retried with the recipients not sent yet
+    """
+    logger.info("sending welcome email to " + str(len(recipients)) +
+                " users")
+
+    sent, rejected = send_messages(
+        [get_welcome_email(email, name) for email, name in recipients])
+    done = sent + len(rejected)
+    if done < len(recipients):
+        raise self.retry(args=(recipients[done:],),
+                         countdown=get_email_retry_countdown(
+                             self.request.retries))
+
+    return sent
+
+
+# a single drain runs at a time, the processing list is its own,
+# a drain published meanwhile runs once more after it
+@cron(name="send_queued_emails", jitter=0, overlap=OVERLAP_COALESCE)
+def send_queued_emails():
+    """
+    sends up to EMAIL_BATCH_SIZE queued emails over one connection,
+    they are moved to a processing list and removed from it once
+    sent, so the emails of a crashed run are sent by the next one.
+    Emails which can not be rendered or are rejected are moved to
+    the dead letter list, another run is scheduled while emails
+    are waiting
+    """
+    cache_adapter = CacheAdapter()
+    batch_size = getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+    # emails queued from now on schedule a new run
+    cache_adapter.delete(EMAIL_DRAIN_SCHEDULED_KEY)
+    # the emails left by the last run go first
+    batch = cache_adapter.get_list(EMAIL_PROCESSING_KEY, batch_size)
+    if len(batch) < batch_size:
+        batch += cache_adapter.move_many(
+            EMAIL_QUEUE_KEY, EMAIL_PROCESSING_KEY, batch_size - len(batch))
+    if not batch:
+        return 0
+
+    logger.info("sending " + str(len(batch)) + " queued emails")
+    messages = []
+    failed = []
+    for index, message in enumerate(batch):
+        try:
+            messages.append((index, render_email(**message)))
+        except Exception as exc:
+            logger.exception("queued email can not be rendered")
+            failed.append((index, message, repr(exc)))
+
+    sent, rejected = send_messages([email for _, email in messages])
+    done = sent + len(rejected)
+    # the emails from the first unsent one on stay in the processing list
+    unsent = messages[done][0] if done < len(messages) else len(batch)
+    dead = [dict(message, error=error)
+            for index, message, error in failed if index < unsent]
+    dead += [dict(batch[index], error='rejected')
+             for index, email in messages[:done] if email in rejected]
+    if dead:
+        cache_adapter.push_many(EMAIL_DEAD_LETTER_KEY, dead)
+    cache_adapter.trim_many(EMAIL_PROCESSING_KEY, unsent)
+    if unsent < len(batch):
+        logger.error("queued emails failed, " + str(len(batch) - unsent) +
+                     " left for the next run")
+
+    # more emails may be waiting after a full batch, they are sent
+    # right away, and after the usual delay after a failure
+    if unsent < len(batch) or len(batch) == batch_size:
+        countdown = 0 if unsent == len(batch) else getattr(
+            settings, 'EMAIL_BATCH_DELAY', 5)
+        if cache_adapter.add(EMAIL_DRAIN_SCHEDULED_KEY, 1, countdown + 60):
+            send_queued_emails.apply_async(countdown=countdown)
+
+    return sent
+
+
+@task(name="send_reset_password_email", bind=True, max_retries=5)
+def send_reset_password_email(self, email, link):
+    """
+    sends email to the client, the task is retried
+    unless the email was sent or rejected
     """
     logger.info("sending reset password email to - " + email)
 
-    content = "Click the below link to reset your password : " + link
+    sent, rejected = send_messages([render_email(
+        'user/emails/reset_password', "Password Reset", {'link': link},
+        EMAIL_FROM, [email])])
+    if not sent and not rejected:
+        raise self.retry(
+            countdown=get_email_retry_countdown(self.request.retries))
+
+    return sent
+
 
-    return send_mail(
-        "Password Reset",
-        content,
-        'sajal.4591@gmail.com',
-        [email],
-        fail_silently=False
-    )
+@task(name="upload_profile_image", bind=True, max_retries=5)
+def upload_profile_image(self, user_id, spool_path, s3_upload_path,
+                         content_addressed=False):
+    """
+    uploads a spooled profile image to s3 and sets it on the
+    user, failed uploads are retried with an exponential backoff.
+    The thumbnails are then made from the spooled file
+    """
+    logger.info("uploading profile image of user - " + str(user_id))
+
+    User = get_user_model()
+    try:
+        upload_file_to_aws(spool_path, s3_upload_path, content_addressed)
+    except (BotoCoreError, ClientError) as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=10 * 2 ** self.request.retries)
+        logger.error("profile image upload failed for user - " +
+                     str(user_id))
+        User.objects.filter(id=user_id).update(
+            profile_image=None,
+            profile_image_status=User.PROFILE_IMAGE_FAILED)
+        os.remove(spool_path)
+
+        return False
+    except FileNotFoundError:
+        logger.error("spooled profile image not found - " + spool_path)
+        User.objects.filter(id=user_id).update(
+            profile_image=None,
+            profile_image_status=User.PROFILE_IMAGE_FAILED)
+
+        return False
+
+    User.objects.filter(id=user_id).update(
+        profile_image=s3_upload_path,
+        profile_image_status=User.PROFILE_IMAGE_UPLOADED)
+    create_profile_image_variants.delay(
+        user_id, s3_upload_path, spool_path, content_addressed)
+
+    return True
+
+
+@task(name="create_profile_image_variants", bind=True, max_retries=5)
+def create_profile_image_variants(self, user_id, s3_upload_path,
+                                  spool_path=None, content_addressed=False):
+    """
+    makes the thumbnails of a profile image and uploads them
+    next to it on s3, the image is downloaded from s3 if it
+    has not been spooled. The thumbnails of a content addressed
+    image are made only once
+    """
+    logger.info("making profile image variants of user - " + str(user_id))
+
+    User = get_user_model()
+    variant_keys = None
+    if content_addressed:
+        variant_keys = User.objects.filter(
+            profile_image=s3_upload_path,
+            profile_image_variants__isnull=False
+        ).values_list('profile_image_variants', flat=True).first()
+
+    downloaded = spool_path is None and variant_keys is None
+    if downloaded:
+        spool_path = get_spool_path(s3_upload_path)
+
+    try:
+        if variant_keys is None:
+            if not os.path.exists(spool_path):
+                download_from_aws(s3_upload_path, spool_path)
+            variant_keys = upload_variants(
+                s3_upload_path, make_variants(spool_path),
+                getattr(settings, 'AWS_S3_IMMUTABLE_CACHE_CONTROL')
+                if content_addressed else None)
+    except (BotoCoreError, ClientError) as exc:
+        if self.request.retries < self.max_retries:
+            # a spooled file is kept for the retry, downloads are not
+            if downloaded and os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise self.retry(exc=exc, countdown=10 * 2 ** self.request.retries)
+        logger.error("profile image variants failed for user - " +
+                     str(user_id))
+    except OSError:
+        logger.error("not a valid profile image - " + s3_upload_path)
+
+    if spool_path is not None and os.path.exists(spool_path):
+        os.remove(spool_path)
+    if variant_keys is None:
+        return False
+
+    # the user may have set another image in the meantime
+    User.objects.filter(
+        id=user_id, profile_image=s3_upload_path
+    ).update(profile_image_variants=variant_keys)
+
+    return True
+
+
+@task(name="run_batch_job_range", ignore_result=False)
+def run_batch_job_range(name, first_id, last_id):
+    """
+    processes a range of ids of a batch job, one of the
+    tasks of BatchJob.fan_out, its result is read by the chord
+    """
+    logger.info("running batch job " + name + " from id " +
+                str(first_id) + " to " + str(last_id))
+
+    return get_job(name).process_range(first_id, last_id)
+
+
+@task(name="complete_batch_job")
+def complete_batch_job(name):
+    """
+    called once every range of a fanned out batch job is done
+    """
+    logger.info("batch job done - " + name)
+    get_job(name).on_complete()
@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from helpers.cache_adapter import CacheAdapter
+from worker.tasks import send_bulk_welcome_email, send_reset_password_email, \
+    send_queued_emails, upload_profile_image, EMAIL_QUEUE_KEY, \
+    EMAIL_PROCESSING_KEY, EMAIL_DEAD_LETTER_KEY, EMAIL_DRAIN_SCHEDULED_KEY
+
+
+class EmailTasksTest(SimpleTestCase):
+    """
+    Tests the retries of the email tasks
+    """
+
+    def test_bulk_welcome_email_retries_unsent(self):
+        """
+        Test if only the recipients not sent yet are retried
+        """
+        recipients = [('user' + str(index) + '@test.com', 'User')
+                      for index in range(4)]
+        results = [(1, [mock.Mock()]), (2, [])]
+        with mock.patch('worker.tasks.send_messages',
+                        side_effect=results) as send:
+            send_bulk_welcome_email.apply(args=(recipients,))
+
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual([message.to[0] for message in send.call_args[0][0]],
+                         ['user2@test.com', 'user3@test.com'])
+
+    def test_reset_password_email_retried(self):
+        """
+        Test if the email is sent again after a failure, and
+        not after a rejection
+        """
+        with mock.patch('worker.tasks.send_messages',
+                        side_effect=[(0, []), (1, [])]) as send:
+            result = send_reset_password_email.apply(
+                args=('test@test.com', 'link'))
+
+        self.assertEqual(send.call_count, 2)
+
+        with mock.patch('worker.tasks.send_messages',
+                        return_value=(0, [mock.Mock()])) as send:
+            result = send_reset_password_email.apply(
+                args=('test@test.com', 'link'))
+
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(result.result, 0)
+
+
+class QueuedEmailsTest(SimpleTestCase):
+    """
+    Tests sending the queued emails in batches
+    """
+
+    keys = [EMAIL_QUEUE_KEY, EMAIL_PROCESSING_KEY, EMAIL_DEAD_LETTER_KEY,
+            EMAIL_DRAIN_SCHEDULED_KEY]
+
+    def setUp(self):
+        self.cache_adapter = CacheAdapter()
+        self.cache_adapter.delete_many(self.keys)
+
+    def tearDown(self):
+        self.cache_adapter.delete_many(self.keys)
+
+    def queue(self, *template_names):
+        self.cache_adapter.push_many(EMAIL_QUEUE_KEY, [{
+            'template_name': template_name,
+            'subject': 'Welcome!',
+            'context': {'name': 'User'},
+            'from_email': 'test@test.com',
+            'to': ['user' + str(index) + '@test.com'],
+        } for index, template_name in enumerate(template_names)])
+
+    def test_unsent_emails_kept(self):
+        """
+        Test if the emails not sent stay in the processing
+        list and are sent by the next run
+        """
+        self.queue('user/emails/welcome', 'user/emails/welcome')
+
+        with mock.patch('worker.tasks.send_messages',
+                        side_effect=[(1, []), (1, [])]) as send:
+            with mock.patch.object(send_queued_emails, 'apply_async'):
+                send_queued_emails.apply()
+                self.assertEqual(
+                    [message['to'] for message in self.cache_adapter.get_list(
+                        EMAIL_PROCESSING_KEY, 10)],
+                    [['user1@test.com']])
+                send_queued_emails.apply()
+
+        self.assertEqual([message.to for message in send.call_args[0][0]],
+                         [['user1@test.com']])
+        self.assertEqual(
+            self.cache_adapter.get_list(EMAIL_PROCESSING_KEY, 10), [])
+
+    def test_failed_emails_dead_lettered(self):
+        """
+        Test if the emails which can not be rendered or are
+        rejected are moved to the dead letter list
+        """
+        self.queue('user/emails/welcome', 'user/emails/missing',
+                   'user/emails/welcome')
+
+        with mock.patch('worker.tasks.send_messages',
+                        side_effect=lambda messages: (1, messages[1:])):
+            self.assertEqual(send_queued_emails.apply().result, 1)
+
+        dead = self.cache_adapter.get_list(EMAIL_DEAD_LETTER_KEY, 10)
+        self.assertEqual([message['to'] for message in dead],
+                         [['user1@test.com'], ['user2@test.com']])
+        self.assertEqual(dead[1]['error'], 'rejected')
+        self.assertEqual(
+            self.cache_adapter.get_list(EMAIL_PROCESSING_KEY, 10), [])
+        self.assertEqual(self.cache_adapter.get_list(EMAIL_QUEUE_KEY, 10), [])
+
+
+class ProfileImageTasksTest(TestCase):
+    """
+    Tests uploading the profile images
+    """
+
+    def test_upload_profile_image_spool_missing(self):
+        """
+        Test if the image is marked failed when the spooled
+        file is gone
+        """
+        User = get_user_model()
+        user = User.objects.create(
+            email='test@test.com', mobile_number='1234567890',
+            profile_image='profile/test.jpg',
+            profile_image_status=User.PROFILE_IMAGE_PENDING)
+
+        result = upload_profile_image.apply(
+            args=(user.id, '/tmp/missing.jpg', 'profile/test.jpg'))
+
+        self.assertFalse(result.result)
+        user.refresh_from_db()
+        self.assertIsNone(user.profile_image)
+        self.assertEqual(user.profile_image_status, User.PROFILE_IMAGE_FAILED)
@@ -1,8 +1,20 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.secrets')
 app = Celery()
 app.conf.update(settings.CELERY)
+
+
+@worker_process_init.connect
+def precompile_email_templates(**kwargs):
+    """
+    Compiles the email templates as each worker process starts,
+    instead of in the first task that sends each email
+    """
+    from helpers.email_templates import precompile_templates
+
+    precompile_templates()